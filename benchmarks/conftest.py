@@ -0,0 +1,108 @@
+"""
+Benchmarks, run make bench-baseline once on a machine, then make bench compares with the last baseline saved on
+that machine. The baselines are kept in benchmarks/baselines, one directory per machine, and are not committed:
+times from other hardware can not be compared. They need pytest-benchmark (pip install pytest-benchmark).
+
+The files in tests/test_data are timed as they are. The synthetic tracks are real tracks resampled to 1k up to
+--max-points points, so they still go through the rally checkpoints. Every benchmark also records the peak memory
+of one call, traced with tracemalloc, in extra_info['peak_memory_mb'].
+"""
+import tracemalloc
+from pathlib import Path
+import pytest
+from gpsfun.readers import read
+from gpsfun.gpsfun import resample
+
+DATA = Path(__file__).parent.parent.joinpath('tests/test_data')
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def pytest_addoption(parser):
+    parser.addoption('--max-points', type=int, default=1_000_000,
+                     help="largest synthetic track to benchmark, default 1,000,000 points")
+
+
+def pytest_generate_tests(metafunc):
+    if 'points' in metafunc.fixturenames:
+        max_points = metafunc.config.getoption('max_points')
+        metafunc.parametrize('points', [n for n in SIZES if n <= max_points], scope='session')
+
+
+def scale(df, points):
+    """df resampled in time to about points points"""
+    seconds = (df['Date_Time'].iloc[-1] - df['Date_Time'].iloc[0]).total_seconds()
+    return resample(df, seconds / (points - 1), by='time')
+
+
+def write_gpx(df, path):
+    times = df['Date_Time'].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ').values
+    points = '\n'.join(f'<trkpt lat="{lat:.7f}" lon="{lon:.7f}"><ele>{ele:.1f}</ele><time>{t}</time></trkpt>'
+                       for lat, lon, ele, t in zip(df['Latitude'].values, df['Longitude'].values,
+                                                   df['Altitude'].values, times))
+    path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<gpx version="1.1" creator="gpsfun benchmarks" xmlns="http://www.topografix.com/GPX/1/1">'
+                    f'<trk><trkseg>\n{points}\n</trkseg></trk></gpx>\n')
+    return path
+
+
+@pytest.fixture(scope='session')
+def data_dir():
+    return DATA
+
+
+@pytest.fixture(scope='session')
+def roubaix():
+    return [{'Segment_name': 'Ride Start: lap 1', 'location': {'lat': 40.117348, 'lon': -105.258836},
+             'type_name': 'transport', 'type_args': {'timed': None}},
+            {'Segment_name': 'End lap 1, Refuel, ride to start', 'location': {'lat': 40.116263, 'lon': -105.257817},
+             'type_name': 'transport', 'type_args': {'timed': None}},
+            {'Segment_name': 'Race: Lap two', 'location': {'lat': 40.117348, 'lon': -105.258836},
+             'type_name': 'timed', 'type_args': None},
+            {'Segment_name': 'Finish', 'location': {'lat': 40.116263, 'lon': -105.257817}, 'type': 'end'}]
+
+
+@pytest.fixture(scope='session')
+def watopia_waistband():
+    return [{'Segment_name': 'Ride to start', 'location': {'lat': -11.63508, 'lon': 166.97511},
+             'type_name': 'transport', 'type_args': {'timed': None}},
+            {'Segment_name': 'Ride Start', 'location': {'lat': -11.63518, 'lon': 166.97386},
+             'type_name': 'tictoc', 'type_args': {'tictoc': 5}}]
+
+
+@pytest.fixture(scope='session')
+def dan_b():
+    return read(DATA.joinpath('rallystyle/roubaix/dan_b.gpx'))
+
+
+@pytest.fixture(scope='session')
+def rally_track(points, dan_b):
+    """dan_b.gpx with points points"""
+    return scale(dan_b, points)
+
+
+@pytest.fixture(scope='session')
+def tictoc_track(points):
+    return scale(read(DATA.joinpath('tictoc/2020-10-29-19-10-19.fit')), points)
+
+
+@pytest.fixture(scope='session')
+def gpx_file(points, rally_track, tmp_path_factory):
+    return write_gpx(rally_track, tmp_path_factory.mktemp('gpx').joinpath(f'{points}.gpx'))
+
+
+@pytest.fixture
+def measure(benchmark):
+    """
+    measure(func, *args, **kwargs) times func with the benchmark fixture and adds the peak memory of one call.
+    :return: what func returns
+    """
+    def run(func, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info['peak_memory_mb'] = round(peak / 2 ** 20, 3)
+        return benchmark(func, *args, **kwargs)
+    return run
@@ -0,0 +1,48 @@
+"""Rally and tic-toc benchmarks"""
+import pytest
+from gpsfun.readers import read
+from gpsfun.rallystyle import RallyResults
+from gpsfun.tic_toc import TicTocResults
+
+RIDERS = ['dan_b.gpx', 'dean_d.fit', 'jennifer_g.gpx', 'michelle_m.gpx', 'richard_e.gpx']
+
+
+def match_checkpoints(df, segments):
+    return RallyResults(df, segments).match_checkpoints()
+
+
+def rally_results(df, segments):
+    return RallyResults(df, segments).calc_results()
+
+
+def tictoc_results(df, segments):
+    return TicTocResults(df, segments).calc_results()
+
+
+@pytest.mark.parametrize('rider', RIDERS)
+def test_match_checkpoints(measure, data_dir, roubaix, rider):
+    df = read(data_dir.joinpath('rallystyle/roubaix', rider))
+    assert len(measure(match_checkpoints, df, roubaix)) == len(roubaix)
+
+
+@pytest.mark.parametrize('rider', RIDERS)
+def test_calc_results(measure, data_dir, roubaix, rider):
+    df = read(data_dir.joinpath('rallystyle/roubaix', rider))
+    assert len(measure(rally_results, df, roubaix)) == len(roubaix)
+
+
+def test_calc_results_scaled(measure, rally_track, dan_b, roubaix, points):
+    if points < len(dan_b):
+        pytest.skip("With fewer points then were recorded the checkpoints are missed")
+    assert len(measure(rally_results, rally_track, roubaix)) == len(roubaix)
+
+
+def test_tictoc(measure, data_dir, watopia_waistband):
+    df = read(data_dir.joinpath('tictoc/2020-10-29-19-10-19.fit'))
+    results = measure(tictoc_results, df, watopia_waistband)
+    assert results[1]['distance'] > 0
+
+
+def test_tictoc_scaled(measure, tictoc_track, watopia_waistband):
+    results = measure(tictoc_results, tictoc_track, watopia_waistband)
+    assert results[1]['distance'] > 0
@@ -0,0 +1,27 @@
+"""Reader benchmarks"""
+import shutil
+import pytest
+from gpsfun import readers
+
+FILES = {'gpx': ['gpx/Mt_Evans_Hill_Climb_v1.gpx', 'rallystyle/roubaix/dan_b.gpx'],
+         'tcx': ['tcx/test_tcx_2_laps.tcx'],
+         'fit': ['fit/Mt_Evans_Hill_Climb_v1.fit', 'rallystyle/roubaix/dean_d.fit', 'tictoc/2020-10-29-19-10-19.fit']}
+READERS = {'gpx': readers.gpx, 'tcx': readers.tcx, 'fit': readers.fit}
+
+
+@pytest.mark.parametrize('reader, path', [(r, p) for r, paths in FILES.items() for p in paths])
+def test_reader(measure, data_dir, reader, path):
+    df = measure(READERS[reader], data_dir.joinpath(path))
+    assert len(df)
+
+
+@pytest.mark.skipif(shutil.which('gpsbabel') is None, reason="gpsbabel is not installed")
+@pytest.mark.parametrize('path', [p for paths in FILES.values() for p in paths])
+def test_gpsbabel(measure, data_dir, path):
+    df = measure(readers.gpsbabel, str(data_dir.joinpath(path)))
+    assert len(df)
+
+
+def test_gpx_scaled(measure, gpx_file, points):
+    df = measure(readers.gpx, gpx_file)
+    assert abs(len(df) - points) <= 1
@@ -0,0 +1,23 @@
+"""Track benchmarks"""
+import pytest
+from gpsfun.readers import read
+from gpsfun.tracks import Track
+
+FILES = ['gpx/Mt_Evans_Hill_Climb_v1.gpx', 'rallystyle/roubaix/dan_b.gpx', 'tcx/test_tcx_2_laps.tcx',
+         'fit/Mt_Evans_Hill_Climb_v1.fit']
+
+
+def calculate(df):
+    """A new Track each time, so nothing is cached"""
+    return Track(df).calculate
+
+
+@pytest.mark.parametrize('path', FILES)
+def test_calculate(measure, data_dir, path):
+    result = measure(calculate, read(data_dir.joinpath(path)))
+    assert result['total_distance'] > 0
+
+
+def test_calculate_scaled(measure, rally_track):
+    result = measure(calculate, rally_track)
+    assert result['total_distance'] > 0
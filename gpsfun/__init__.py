@@ -1,5 +1,56 @@
-"""Top-level package for gpsfun."""
+"""Top-level package for gpsfun.
+
+The public API is loaded when it is first used, so import gpsfun is fast and only the parts that are used are
+imported, with their dependencies:
+
+    import gpsfun
+    df = gpsfun.read('ride.fit')  # loads gpsfun.readers and pandas
+    gpsfun.Track(df).calculate  # loads gpsfun.tracks
+
+scipy is only loaded by checkpoint matching and the savgol altitude filter, fitdecode when a fit file is read,
+requests by geocoding and pyarrow by the parquet and feather export.
+
+gpsfun.export is the module, not the function, call gpsfun.export.export(df, 'geojson'). Importing a submodule
+sets the package attribute to the module, so a function with the same name could not be kept there.
+"""
+import importlib
 
 __author__ = """Vincent Davis"""
 __email__ = 'vincent@heteroskedastic.com'
 __version__ = '0.0.1'
+
+# name: module it is in, a name that is the module name is the module itself
+_api = {'read': 'readers',
+        'gpx': 'readers',
+        'tcx': 'readers',
+        'fit': 'readers',
+        'gpsbabel': 'readers',
+        'Track': 'tracks',
+        'RallyResults': 'rallystyle',
+        'TicTocResults': 'tic_toc',
+        'EventScorer': 'event',
+        'process_files': 'batch',
+        'export': 'export',
+        'GPSFunException': 'exceptions'}
+
+__all__ = sorted(_api)
+
+
+def __getattr__(name):
+    """PEP 562, import the module for name the first time it is used"""
+    if name in _api:
+        module = importlib.import_module(f'{__name__}.{_api[name]}')
+        value = module if name == _api[name] else getattr(module, name)
+    else:
+        try:
+            value = importlib.import_module(f'{__name__}.{name}')
+        except ModuleNotFoundError as e:
+            if e.name != f'{__name__}.{name}':
+                raise
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_api))
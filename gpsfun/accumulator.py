@@ -0,0 +1,243 @@
+"""
+Track statistics for points that arrive one at a time, for live tracking.
+
+    acc = TrackAccumulator()
+    for point in stream:  # {'Latitude':, 'Longitude':, 'Altitude':, 'Date_Time':}
+        acc.append(point)
+        acc.calculate  # same keys as Track.calculate
+
+Every append is O(1) and no history is kept. median_dist is from a log spaced histogram, the gaps are counted by value,
+devices record at a few fixed intervals, so median_gap is exact.
+"""
+import math
+from collections import Counter
+import numpy as np
+import pandas as pd
+try:
+    from . import geodesic
+except:
+    import geodesic
+
+
+class LogHistogram(object):
+    """
+    Streaming quantiles of positive values from a histogram with log spaced bins, the result is within
+    relative_error of the exact quantile no matter what order the values come in. O(1) time per value and
+    fixed memory, about 3700 bins for the defaults.
+    """
+
+    def __init__(self, low=1e-3, high=1e5, relative_error=0.0025):
+        self.low = low
+        self.log_width = math.log1p(2 * relative_error)
+        self.counts = np.zeros(int(math.log(high / low) / self.log_width) + 2, dtype=np.int64)
+        self.n = 0
+
+    def add(self, x):
+        i = int(math.log(x / self.low) / self.log_width) + 1 if x > self.low else 0
+        self.counts[min(i, len(self.counts) - 1)] += 1
+        self.n += 1
+
+    def quantile(self, p=0.5):
+        if self.n == 0:
+            return math.nan
+        i = int(np.searchsorted(np.cumsum(self.counts), p * self.n))
+        # middle of the bin
+        return self.low * math.exp((i - 0.5) * self.log_width) if i else self.low
+
+
+def counter_median(counts):
+    """
+    Median of the values in a Counter, the mean of the two middle values for an even count like np.median.
+    """
+    n = sum(counts.values())
+    if n == 0:
+        return None
+    middle = [(n - 1) // 2, n // 2]
+    found = []
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        while middle and middle[0] < seen:
+            found.append(value)
+            middle.pop(0)
+    return sum(found) / 2
+
+
+class TrackAccumulator(object):
+    """
+    Running Track statistics, calculate has the same keys as Track.calculate and matches it on the same points,
+    except median_dist which is within 0.25%.
+    method: the distance model, see geodesic.METHODS
+    min_movement: points that moved less then this many meters are not counted in the moving time, see Track.
+    threshold: filtered_ascent and filtered_descent use elevation.hysteresis with this threshold, it is the
+        Track default filter.
+
+    The altitude change is included in the distance when both points have an altitude.
+    """
+
+    def __init__(self, method='haversine', min_movement=0.05, threshold=5.0):
+        self.distance = geodesic.METHODS[method]
+        self.min_movement = min_movement
+        self.threshold = threshold
+        self.points = 0
+        self.last = None  # (latitude, longitude, altitude, time in ns)
+        self.start_time = None
+        self.end_time = None
+        # elevation
+        self.altitudes = 0
+        self.altitude_sum = 0.0
+        self.min_elevation = math.nan
+        self.max_elevation = math.nan
+        self.ascent = 0.0
+        self.descent = 0.0
+        self.filtered = None  # the hysteresis altitude
+        self.filtered_ascent = 0.0
+        self.filtered_descent = 0.0
+        # distance, mean, min and median are of the distances > 0 like Track
+        self.total_distance = 0.0
+        self.moved = 0
+        self.max_dist = math.nan
+        self.min_dist = math.nan
+        self.median_dist = LogHistogram()
+        # time, in ns
+        self.gaps = 0
+        self.activity_time = 0
+        self.moving_time = 0
+        self.max_gap = None
+        self.min_gap = None
+        self.gap_counts = Counter()
+
+    @staticmethod
+    def _value(point, name):
+        value = point.get(name)
+        return math.nan if value is None else float(value)
+
+    def append(self, point):
+        """
+        point: dict like object with Latitude, Longitude, Date_Time and optionally Altitude
+        """
+        time = pd.Timestamp(point['Date_Time'])
+        self._add(self._value(point, 'Latitude'), self._value(point, 'Longitude'), self._value(point, 'Altitude'),
+                  time, None)
+
+    def extend(self, points):
+        """
+        points: DataFrame with the Track columns or an iterable of points. For a DataFrame the distances are
+        calculated for the whole batch at once.
+        """
+        if not isinstance(points, pd.DataFrame):
+            for point in points:
+                self.append(point)
+            return
+        if len(points) == 0:
+            return
+        latitude = points['Latitude'].to_numpy(dtype=np.float64)
+        longitude = points['Longitude'].to_numpy(dtype=np.float64)
+        if 'Altitude' in points.columns:
+            altitude = points['Altitude'].to_numpy(dtype=np.float64)
+        else:
+            altitude = np.full(len(points), np.nan)
+        times = pd.DatetimeIndex(points['Date_Time'])
+        if self.last is not None:
+            lat0, lon0, alt0 = self.last[:3]
+            between = self._distance(np.r_[lat0, latitude], np.r_[lon0, longitude], np.r_[alt0, altitude])
+        else:
+            between = np.r_[np.nan, self._distance(latitude, longitude, altitude)]
+        for i in range(len(points)):
+            self._add(latitude[i], longitude[i], altitude[i], times[i], between[i])
+
+    def _distance(self, latitude, longitude, altitude):
+        """Distance between each point and the next"""
+        flat = self.distance(latitude[:-1], longitude[:-1], latitude[1:], longitude[1:])
+        change = np.diff(altitude)
+        return np.where(np.isnan(change), flat, np.sqrt(flat ** 2 + change ** 2))
+
+    def _add(self, latitude, longitude, altitude, time, between):
+        self.points += 1
+        if self.start_time is None:
+            self.start_time = time
+        self.end_time = time
+        if not math.isnan(altitude):
+            self.altitudes += 1
+            self.altitude_sum += altitude
+            if not altitude >= self.min_elevation:
+                self.min_elevation = altitude
+            if not altitude <= self.max_elevation:
+                self.max_elevation = altitude
+            if self.filtered is None:
+                self.filtered = altitude
+            else:
+                filtered = min(max(self.filtered, altitude - self.threshold / 2), altitude + self.threshold / 2)
+                if filtered > self.filtered:
+                    self.filtered_ascent += filtered - self.filtered
+                else:
+                    self.filtered_descent += filtered - self.filtered
+                self.filtered = filtered
+        ns = time.value
+        if self.last is not None:
+            lat0, lon0, alt0, ns0 = self.last
+            change = altitude - alt0
+            if change > 0:
+                self.ascent += change
+            elif change < 0:
+                self.descent += change
+            if between is None:
+                between = self._distance(np.array([lat0, latitude]), np.array([lon0, longitude]),
+                                         np.array([alt0, altitude]))[0]
+            if not math.isnan(between):
+                self.total_distance += between
+                if not between <= self.max_dist:
+                    self.max_dist = between
+                if between > 0:
+                    self.moved += 1
+                    if not between >= self.min_dist:
+                        self.min_dist = between
+                    self.median_dist.add(between)
+            gap = ns - ns0
+            self.gaps += 1
+            self.activity_time += gap
+            if not between < self.min_movement:
+                self.moving_time += gap
+            self.max_gap = gap if self.max_gap is None else max(self.max_gap, gap)
+            self.min_gap = gap if self.min_gap is None else min(self.min_gap, gap)
+            self.gap_counts[gap] += 1
+        self.last = (latitude, longitude, altitude, ns)
+
+    @property
+    def calculate(self):
+        """
+        The same statistics as Track.calculate
+        """
+        r = {}
+        if self.altitudes:
+            r.update({
+                "min_elevation": self.min_elevation,
+                "max_elevation": self.max_elevation,
+                "avg_elevation": self.altitude_sum / self.altitudes,
+                "ascent": self.ascent,
+                "descent": self.descent,
+                "filtered_ascent": self.filtered_ascent,
+                "filtered_descent": self.filtered_descent,
+            })
+        r.update({'total_distance': self.total_distance,
+                  'mean_dist': self.total_distance / self.moved if self.moved else math.nan,
+                  'median_dist': self.median_dist.quantile(0.5),
+                  'max_dist': self.max_dist,
+                  'min_dist': self.min_dist
+                  })
+
+        def timedelta(ns):
+            return pd.NaT if ns is None else pd.Timedelta(int(round(ns)))
+
+        r.update({
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "elapsed_duration": self.end_time - self.start_time if self.points else pd.NaT,
+            "activity_time": pd.Timedelta(self.activity_time),
+            "moving_time": pd.Timedelta(self.moving_time),
+            'mean_gap': timedelta(self.activity_time / self.gaps if self.gaps else None),
+            'median_gap': timedelta(counter_median(self.gap_counts)),
+            'max_gap': timedelta(self.max_gap),
+            'min_gap': timedelta(self.min_gap)
+            })
+        return r
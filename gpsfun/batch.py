@@ -0,0 +1,103 @@
+"""
+Process many activity files at once, spread over a pool of worker processes.
+
+    for result in process_files('rides/', workers=8):
+        print(result['file'], result['error'] or result['total_distance'])
+
+Results come back as each chunk of files finishes, not in the order they were given.
+"""
+import io
+import os
+import glob
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from . import readers
+    from .tracks import Track
+except:
+    import readers
+    from tracks import Track
+
+FILE_TYPES = ('.gpx', '.tcx', '.fit', '.gz', '.zip')
+
+
+def find_files(source):
+    """
+    source: a directory (searched recursively), a glob pattern, a single path or an iterable of paths and file objects.
+    Directories and glob patterns only return gpx, tcx, fit, gz and zip files.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        source = os.fspath(source)
+        if os.path.isdir(source):
+            return sorted(str(p) for p in Path(source).rglob('*') if p.is_file() and p.suffix.lower() in FILE_TYPES)
+        if glob.has_magic(source):
+            return sorted(p for p in glob.glob(source, recursive=True)
+                          if os.path.isfile(p) and Path(p).suffix.lower() in FILE_TYPES)
+        return [source]
+    return list(source)
+
+
+def summarize(df):
+    """
+    The default per file summary, Track.calculate plus the number of points.
+    """
+    result = Track(df).calculate
+    result['points'] = len(df)
+    return result
+
+
+def _load(item):
+    """
+    Paths are read in the worker. File objects have already been read to (name, bytes) in the parent process.
+    """
+    if isinstance(item, tuple):
+        name, data = item
+        f = io.BytesIO(data)
+        f.name = name
+        return name, f
+    return item, item
+
+
+def _process_chunk(chunk, reader, summary, cache):
+    results = []
+    for item in chunk:
+        name, in_file = _load(item)
+        try:
+            df = reader(in_file) if cache is None else reader(in_file, cache=cache)
+            result = summary(df)
+            result['file'] = name
+            result['error'] = None
+        except Exception as e:
+            result = {'file': name, 'error': f"{type(e).__name__}: {e}"}
+        results.append(result)
+    return results
+
+
+def _chunks(items, chunksize):
+    for i in range(0, len(items), chunksize):
+        chunk = items[i:i + chunksize]
+        # File objects can not be sent to another process
+        yield [(getattr(f, 'name', str(i + n)), f.read()) if hasattr(f, 'read') else f for n, f in enumerate(chunk)]
+
+
+def process_files(source, reader=readers.read, summary=summarize, workers=None, chunksize=1, cache=None):
+    """
+    Read and summarize every file in source, see find_files.
+    reader: function(path or file object) -> DataFrame, readers.read or readers.gpsbabel
+    summary: function(DataFrame) -> dict
+    workers: number of processes, default os.cpu_count(). With 0 everything runs in this process.
+    chunksize: number of files sent to a worker at a time, bigger chunks cost less overhead for small files.
+    cache: cache.ParseCache passed to the reader, all the workers share it.
+    reader and summary are sent to the worker processes so they must be module level functions.
+    :return: generator of dicts, one per file, {'file':, 'error': None or the error message, **summary}
+    """
+    items = find_files(source)
+    if workers == 0:
+        for chunk in _chunks(items, chunksize):
+            yield from _process_chunk(chunk, reader, summary, cache)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_process_chunk, chunk, reader, summary, cache) for chunk in _chunks(items, chunksize)]
+        for future in as_completed(futures):
+            yield from future.result()
@@ -0,0 +1,149 @@
+"""
+On disk cache of parsed activity files.
+
+Each entry is a directory with one .npy file per column, so a cache hit is a memory mapped read, no xml or
+gpsbabel parsing. Entries are keyed by a hash of the file content, the reader and the reader version, so a
+re-uploaded file is a hit no matter what it is called. When the cache is bigger than max_bytes the least
+recently used entries are removed.
+
+    cache = ParseCache('/var/cache/gpsfun', max_bytes=2 * 1024 ** 3)
+    df = readers.read('ride.fit', cache=cache)
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+class ParseCache(object):
+    """
+    directory: where the entries are saved, it is created if needed.
+    max_bytes: size limit for all entries.
+    """
+
+    def __init__(self, directory, max_bytes=1024 ** 3):
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(data, *parts):
+        """
+        data: the raw file bytes
+        parts: anything else the result depends on, reader name, reader version, arguments.
+        """
+        h = hashlib.sha256()
+        for p in parts:
+            h.update(repr(p).encode())
+            h.update(b'\0')
+        h.update(data)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        :return: DataFrame or None if key is not in the cache
+        """
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            os.utime(path)  # mark as recently used
+            columns = {}
+            for i, c in enumerate(meta['columns']):
+                values = np.load(os.path.join(path, f'{i}.npy'), mmap_mode='r')
+                kind = c['kind']
+                if kind == 'datetime':
+                    values = pd.DatetimeIndex(values)
+                    if c['tz']:
+                        values = values.tz_localize('UTC').tz_convert(c['tz'])
+                elif kind == 'category':
+                    values = pd.Categorical.from_codes(values, categories=c['categories'], ordered=c['ordered'])
+                elif kind == 'object':
+                    nulls = np.load(os.path.join(path, f'{i}.null.npy'))
+                    values = np.where(nulls, None, values.astype(object))
+                columns[c['name']] = values
+        except (FileNotFoundError, NotADirectoryError):
+            # Not cached, or evicted by another process while reading
+            return None
+        return pd.DataFrame(columns, columns=[c['name'] for c in meta['columns']])
+
+    def put(self, key, df):
+        """
+        Save df under key. The entry is written to a temporary directory and renamed into place, so other
+        processes never see half an entry.
+        """
+        if os.path.exists(self._path(key)):
+            return
+        tmp = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+        try:
+            meta = {'columns': []}
+            for i, name in enumerate(df.columns):
+                s = df[name]
+                c = {'name': name, 'kind': 'array'}
+                if pd.api.types.is_datetime64_any_dtype(s):
+                    tz = getattr(s.dtype, 'tz', None)
+                    c.update(kind='datetime', tz=str(tz) if tz else None)
+                    values = (s.dt.tz_convert('UTC').dt.tz_localize(None) if tz else s).values
+                elif isinstance(s.dtype, pd.CategoricalDtype):
+                    c.update(kind='category', categories=s.cat.categories.tolist(), ordered=bool(s.cat.ordered))
+                    values = s.cat.codes.values
+                elif s.dtype == object:
+                    c['kind'] = 'object'
+                    np.save(os.path.join(tmp, f'{i}.null.npy'), s.isna().values)
+                    values = s.fillna('').astype(str).values.astype(str)
+                else:
+                    values = s.values
+                np.save(os.path.join(tmp, f'{i}.npy'), values, allow_pickle=False)
+                meta['columns'].append(c)
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        try:
+            os.rename(tmp, self._path(key))
+        except OSError:
+            # Another process saved the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def _entries(self):
+        """
+        :return: [(last used, size in bytes, path)]
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.tmp-') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(e.stat().st_size for e in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, size, path))
+            except FileNotFoundError:
+                pass  # removed by another process
+        return entries
+
+    def size(self):
+        return sum(e[1] for e in self._entries())
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is under max_bytes
+        """
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
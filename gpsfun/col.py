@@ -2,16 +2,62 @@
 txc_names = {"LatitudeDegrees": "Latitude",
              "LongitudeDegrees": "Longitude",
              'AltitudeMeters':'Altitude',
-             'Time': 'Date_Time'
+             'Time': 'Date_Time',
+             'DistanceMeters': 'Distance',
+             'Cadence': 'Cadence'
              }
 tcx_heartate = {"Value": "HeartRate"}
-txc_extentions = {}
+# Trackpoint extension (ns3:TPX) elements by local name
+txc_extentions = {'Speed': 'Speed',
+                  'Watts': 'Power',
+                  'RunCadence': 'Cadence'}
+# Lap summary elements, <AverageHeartRateBpm><Value> is read as AverageHeartRateBpm. The lap extension (ns3:LX)
+# elements are included.
+tcx_lap_numeric = ['TotalTimeSeconds', 'DistanceMeters', 'MaximumSpeed', 'Calories', 'AverageHeartRateBpm',
+                   'MaximumHeartRateBpm', 'Cadence', 'AvgSpeed', 'AvgRunCadence', 'MaxRunCadence', 'Steps',
+                   'AvgWatts', 'MaxWatts']
+tcx_lap_text = ['Intensity', 'TriggerMethod']
 
-gpx_names = {'@lat': 'Latitude',
-             '@lon': 'Longitude',
+gpx_names = {'lat': 'Latitude',
+             'lon': 'Longitude',
              'ele': 'Altitude',
              'time': 'Date_Time'
              }
-gpx_extentions = {'ns3:TrackPointExtension.ns3:atemp': 'Temp',
-                  'ns3:TrackPointExtension.ns3:hr': 'HeartRate',
-                  'ns3:TrackPointExtension.ns3:cad': 'Cadence'}
+# Extension elements by local name, the namespace prefix (gpxtpx:, ns3:, ...) depends on the device.
+gpx_extentions = {'atemp': 'Temp',
+                  'hr': 'HeartRate',
+                  'cad': 'Cadence',
+                  'power': 'Power',
+                  'speed': 'Speed'}
+
+# FIT record fields. The enhanced_ fields are used when they are in the record.
+fit_names = {'timestamp': 'Date_Time',
+             'position_lat': 'Latitude',
+             'position_long': 'Longitude',
+             'altitude': 'Altitude',
+             'enhanced_altitude': 'Altitude',
+             'distance': 'Distance',
+             'speed': 'Speed',
+             'enhanced_speed': 'Speed',
+             'heart_rate': 'HeartRate',
+             'cadence': 'Cadence',
+             'power': 'Power',
+             'temperature': 'Temp'}
+
+# gpsbabel unicsv names that differ from the native readers
+gpsbabel_names = {'Heartrate': 'HeartRate',
+                  'Temperature': 'Temp'}
+
+# Track schema, every reader returns these dtypes. Date_Time is stored as int64 nanoseconds since the epoch.
+# Distance is cumulative so it stays float64, float32 is only good to about 1 meter at 100km.
+schema = {'Latitude': 'float64',
+          'Longitude': 'float64',
+          'Altitude': 'float32',
+          'Distance': 'float64',
+          'Speed': 'float32',
+          'HeartRate': 'float32',
+          'Cadence': 'float32',
+          'Power': 'float32',
+          'Temp': 'float32',
+          'Date_Time': 'datetime64[ns, UTC]',
+          'lap': 'category'}
@@ -1,50 +1,126 @@
-#See https://github.com/vincentdavis/cmpgpx
-
-import numpy
-
-def align_tracks(track1, track2, gap_penalty):
-    """ Needleman-Wunsch algorithm adapted for gps tracks. """
-
-    _log.info("Aligning tracks")
-
-    def similarity(p1, p2):
-        d = gpxpy.geo.distance(p1.latitude, p1.longitude, p1.elevation,
-                               p2.latitude, p2.longitude, p2.elevation)
-        return -d
-
-    # construct f-matrix
-    f = numpy.zeros((len(track1), len(track2)))
-    for i in range(0, len(track1)):
-        f[i][0] = gap_penalty * i
-    for j in range(0, len(track2)):
-        f[0][j] = gap_penalty * j
-    for i in range(1, len(track1)):
-        t1 = track1[i]
-        for j in range(1, len(track2)):
-            t2 = track2[j]
-            match = f[i-1][j-1] + similarity(t1, t2)
-            delete = f[i-1][j] + gap_penalty
-            insert = f[i][j-1] + gap_penalty
-            f[i, j] = max(match, max(delete, insert))
+"""
+Align two gps tracks point by point.
+See https://github.com/vincentdavis/cmpgpx
+"""
+import numpy as np
+
+try:
+    from . import geodesic
+except:
+    import geodesic
+
+DIAGONAL, UP, LEFT = 0, 1, 2  # traceback pointers: match, gap in track2, gap in track1
+
+
+def track_points(track):
+    """
+    track: Track, DataFrame with Latitude, Longitude and optionally Altitude columns, or an array of
+    (latitude, longitude) or (latitude, longitude, altitude) rows.
+    :return: float64 array (n, 2) or (n, 3)
+    """
+    df = getattr(track, 'df', track)
+    if hasattr(df, 'columns'):
+        columns = ['Latitude', 'Longitude'] + (['Altitude'] if 'Altitude' in df.columns else [])
+        points = df[columns].to_numpy(dtype=np.float64)
+    else:
+        points = np.asarray(track, dtype=np.float64)
+    if points.ndim != 2 or points.shape[1] not in (2, 3):
+        raise ValueError("Expected rows of (latitude, longitude) or (latitude, longitude, altitude)")
+    return points
+
+
+def _diagonal_range(d, n, m, band):
+    """
+    Rows i of the cells (i, d - i) on anti-diagonal d that are inside the matrix and the band.
+    The band is measured in rows of track1 around the line from (0, 0) to (n, m).
+    """
+    lo, hi = max(0, d - m), min(n, d)
+    if band is not None:
+        r = n / m if m else 0.0
+        lo = max(lo, int(np.ceil((d * r - band) / (1 + r))))
+        hi = min(hi, int(np.floor((d * r + band) / (1 + r))))
+    return lo, hi
+
+
+def _take(values, start, rows):
+    """values[rows - start], -inf for rows that are not in values"""
+    k = rows - start
+    ok = (k >= 0) & (k < len(values))
+    out = np.full(rows.shape, -np.inf)
+    out[ok] = values[k[ok]]
+    return out
+
+
+def align_tracks(track1, track2, gap_penalty, band=None):
+    """
+    Needleman-Wunsch algorithm adapted for gps tracks.
+    The similarity of two points is minus the distance between them in meters, including the altitude.
+    gap_penalty: the score of leaving a point unmatched, it should be negative, for example -50 (meters)
+    band: only fill the cells within band rows of the diagonal (Sakoe-Chiba band). Memory is O(n * band)
+        instead of O(n * m), use it for long tracks. None fills the whole matrix.
+
+    The matrix is filled one anti-diagonal at a time, every cell on an anti-diagonal only depends on the two before
+    it so each one is a single numpy step. Only those two score diagonals are kept, plus one byte per cell for the
+    traceback.
+    :return: (a1, a2) int arrays of the same length, the aligned row positions in track1 and track2.
+        -1 is a gap, that point of the other track did not match anything.
+    """
+    p1 = track_points(track1)
+    p2 = track_points(track2)
+    n, m = len(p1), len(p2)
+    # The altitude is only used if both tracks have it, a missing altitude counts as no change
+    altitude = p1.shape[1] == 3 and p2.shape[1] == 3
+
+    ranges = [_diagonal_range(d, n, m, band) for d in range(n + m + 1)]
+    offsets = np.zeros(n + m + 2, dtype=np.int64)
+    offsets[1:] = np.cumsum([max(hi - lo + 1, 0) for lo, hi in ranges])
+    pointers = np.zeros(offsets[-1], dtype=np.int8)
+
+    prev2, lo2 = np.array([]), 0  # diagonal d - 2
+    prev1, lo1 = np.zeros(1), 0  # diagonal d - 1, starts as d = 0, the single cell (0, 0)
+    for d in range(1, n + m + 1):
+        lo, hi = ranges[d]
+        if hi < lo:
+            raise ValueError(f"band {band} is too narrow to align tracks of {n} and {m} points")
+        i = np.arange(lo, hi + 1)
+        j = d - i
+        match = _take(prev2, lo2, i - 1)
+        both = (i > 0) & (j > 0)
+        a = p1[i[both] - 1]
+        b = p2[j[both] - 1]
+        dist = geodesic.haversine(a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+        if altitude:
+            dist = np.sqrt(dist ** 2 + np.nan_to_num(a[:, 2] - b[:, 2]) ** 2)
+        match[both] -= dist
+        # Cells outside the matrix or the band come back as -inf
+        delete = _take(prev1, lo1, i - 1) + gap_penalty
+        insert = _take(prev1, lo1, i) + gap_penalty
+        scores = np.stack([match, delete, insert])
+        best = scores.argmax(axis=0)
+        pointers[offsets[d]:offsets[d + 1]] = best
+        prev2, lo2 = prev1, lo1
+        prev1, lo1 = scores[best, np.arange(len(i))], lo
+
+    if not np.isfinite(prev1[n - lo1]):
+        raise ValueError(f"band {band} is too narrow to align tracks of {n} and {m} points")
 
     # backtrack to create alignment
-    a1 = []
-    a2 = []
-    i = len(track1) - 1
-    j = len(track2) - 1
+    a1 = np.empty(n + m, dtype=np.int64)
+    a2 = np.empty(n + m, dtype=np.int64)
+    k = 0
+    i, j = n, m
     while i > 0 or j > 0:
-        if i > 0 and j > 0 and \
-           f[i, j] == f[i-1][j-1] + similarity(track1[i], track2[j]):
-            a1.insert(0, track1[i])
-            a2.insert(0, track2[j])
+        d = i + j
+        step = pointers[offsets[d] + i - ranges[d][0]]
+        if step == DIAGONAL:
             i -= 1
             j -= 1
-        elif i > 0 and f[i][j] == f[i-1][j] + gap_penalty:
-            a1.insert(0, track1[i])
-            a2.insert(0, None)
+            a1[k], a2[k] = i, j
+        elif step == UP:
             i -= 1
-        elif j > 0 and f[i][j] == f[i][j-1] + gap_penalty:
-            a1.insert(0, None)
-            a2.insert(0, track2[j])
+            a1[k], a2[k] = i, -1
+        else:
             j -= 1
-    return a1, a2
+            a1[k], a2[k] = -1, j
+        k += 1
+    return a1[:k][::-1].copy(), a2[:k][::-1].copy()
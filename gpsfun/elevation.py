@@ -0,0 +1,212 @@
+"""
+Elevation from local SRTM .hgt tiles, no network access, and altitude filters for the ascent and descent.
+
+A tile covers one degree, it is named for its south west corner, N39W106.hgt covers latitude 39 to 40 and
+longitude -106 to -105. The files are big endian int16 grids, 1201 x 1201 (3 arc second) or 3601 x 3601
+(1 arc second), the first row is the north edge. -32768 is a void.
+Download them from https://dwtkns.com/srtm30m/ or https://e4ftl01.cr.usgs.gov/MEASURES/SRTMGL1.003/
+
+    dem = DEM('/data/srtm')
+    df = fill_altitude(df, dem)  # only the missing values
+    df = fill_altitude(df, dem, replace=True)  # use the DEM for every point
+
+Recorded altitude jitters up and down by a meter or so every second, and summing every rise counts the jitter as
+climbing. The filters here work on the whole array at once, missing values are skipped and stay nan:
+
+    moving_average: mean over a window of points, or of meters if the cumulative distance is given
+    savgol: Savitzky-Golay, a local polynomial fit, keeps the shape of short climbs better than the mean
+    hysteresis: the altitude only moves once it has changed more then threshold meters, so changes in
+        direction that are smaller then threshold are ignored. This is what most devices do.
+"""
+import os
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+VOID = -32768
+
+
+def hgt_name(latitude, longitude):
+    """Name of the tile the point is in, 39.7, -105.5 -> 'N39W106.hgt'"""
+    lat = int(np.floor(latitude))
+    lon = int(np.floor(longitude))
+    return f"{'N' if lat >= 0 else 'S'}{abs(lat):02d}{'E' if lon >= 0 else 'W'}{abs(lon):03d}.hgt"
+
+
+class DEM(object):
+    """
+    directory: where the .hgt files are.
+    max_tiles: how many tiles are kept open, the least recently used is closed. The tiles are memory mapped, so
+        only the pages that are read use memory.
+    """
+
+    def __init__(self, directory, max_tiles=16):
+        self.directory = os.fspath(directory)
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+
+    def tile(self, name):
+        """
+        :return: the tile as a memory mapped int16 array, or None if there is no file for it
+        """
+        if name in self._tiles:
+            self._tiles.move_to_end(name)
+            return self._tiles[name]
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            size = int(round(np.sqrt(os.path.getsize(path) // 2)))
+            grid = np.memmap(path, dtype='>i2', mode='r', shape=(size, size))
+        else:
+            grid = None
+        self._tiles[name] = grid
+        if len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return grid
+
+    def elevation(self, latitude, longitude):
+        """
+        Elevation in meters by bilinear interpolation between the four grid points around each point.
+        The points are grouped by tile so each tile is one numpy step.
+        :return: float64 array, nan where there is no tile, a void or no position
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        result = np.full(latitude.shape, np.nan)
+        ok = np.isfinite(latitude) & np.isfinite(longitude)
+        south = np.floor(latitude[ok]).astype(np.int64)
+        west = np.floor(longitude[ok]).astype(np.int64)
+        rows = np.flatnonzero(ok)
+        corners, groups = np.unique(np.column_stack([south, west]), axis=0, return_inverse=True)
+        for g, (lat0, lon0) in enumerate(corners):
+            grid = self.tile(hgt_name(lat0, lon0))
+            if grid is None:
+                continue
+            i = rows[groups.ravel() == g]
+            n = grid.shape[0] - 1
+            y = (lat0 + 1 - latitude[i]) * n
+            x = (longitude[i] - lon0) * n
+            r = np.clip(np.floor(y).astype(np.int64), 0, n - 1)
+            c = np.clip(np.floor(x).astype(np.int64), 0, n - 1)
+            dy = y - r
+            dx = x - c
+            z = [grid[r + a, c + b].astype(np.float64) for a, b in ((0, 0), (0, 1), (1, 0), (1, 1))]
+            z = np.where(np.array([v == VOID for v in z]), np.nan, z)
+            result[i] = (z[0] * (1 - dx) * (1 - dy) + z[1] * dx * (1 - dy) +
+                         z[2] * (1 - dx) * dy + z[3] * dx * dy)
+        return result
+
+
+def fill_altitude(df, dem, replace=False):
+    """
+    Altitude from the DEM, for files without an altitude or with a bad one, like a barometric altitude that
+    drifts.
+    replace: use the DEM altitude for every point where it has a value, otherwise only for the missing values.
+    :return: a copy of df with the Altitude column filled in
+    """
+    from_dem = dem.elevation(df['Latitude'].values, df['Longitude'].values)
+    if 'Altitude' in df.columns:
+        altitude = df['Altitude'].to_numpy(dtype=np.float64)
+        if replace:
+            altitude = np.where(np.isnan(from_dem), altitude, from_dem)
+        else:
+            altitude = np.where(np.isnan(altitude), from_dem, altitude)
+    else:
+        altitude = from_dem
+    return df.assign(Altitude=pd.Series(altitude, index=df.index, dtype=np.float32))
+
+
+def _valid(altitude):
+    altitude = np.asarray(altitude, dtype=np.float64)
+    return altitude, ~np.isnan(altitude)
+
+
+def moving_average(altitude, window=5, distance=None):
+    """
+    Centered moving average.
+    window: number of points, or meters if distance is given
+    distance: cumulative distance in meters of each point, see Track.cumulative_distance
+    """
+    altitude, valid = _valid(altitude)
+    total = np.concatenate([[0.0], np.cumsum(np.where(valid, altitude, 0.0))])
+    count = np.concatenate([[0], np.cumsum(valid)])
+    n = len(altitude)
+    if distance is None:
+        i = np.arange(n)
+        lo = np.maximum(i - window // 2, 0)
+        hi = np.minimum(i + window // 2 + 1, n)
+    else:
+        distance = np.asarray(distance, dtype=np.float64)
+        lo = np.searchsorted(distance, distance - window / 2, side='left')
+        hi = np.searchsorted(distance, distance + window / 2, side='right')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = (total[hi] - total[lo]) / (count[hi] - count[lo])
+    return np.where(valid, result, np.nan)
+
+
+def savgol(altitude, window=9, order=2):
+    """
+    Savitzky-Golay filter, scipy.signal.savgol_filter over the points that have an altitude.
+    window: number of points, odd
+    """
+    altitude, valid = _valid(altitude)
+    result = np.full(altitude.shape, np.nan)
+    values = altitude[valid]
+    window = min(window, len(values) - (1 - len(values) % 2))
+    if window <= order:
+        result[valid] = values
+    else:
+        from scipy.signal import savgol_filter  # scipy.signal is slow to import, only load it when it is used
+        result[valid] = savgol_filter(values, window, order)
+    return result
+
+
+def hysteresis(altitude, threshold=5.0):
+    """
+    Dead band filter, the output stays put until the altitude is more then threshold / 2 away from it, then it
+    follows at that distance. So a change in direction has to be more then threshold meters to show.
+
+    Each step is y = clip(y_before, x - threshold / 2, x + threshold / 2). A composition of clips is a clip, so
+    the steps are combined with a prefix scan, log2(n) numpy steps instead of a python loop.
+    """
+    altitude, valid = _valid(altitude)
+    result = np.full(altitude.shape, np.nan)
+    x = altitude[valid]
+    if len(x) == 0:
+        return result
+    low = x - threshold / 2
+    high = x + threshold / 2
+    step = 1
+    while step < len(x):
+        # Compose each clip with the combined clips up to step points before it
+        lo, hi = low[step:], high[step:]
+        low[step:], high[step:] = (np.minimum(np.maximum(low[:-step], lo), hi),
+                                   np.minimum(np.maximum(high[:-step], lo), hi))
+        step *= 2
+    result[valid] = np.minimum(np.maximum(x[0], low), high)
+    return result
+
+
+FILTERS = {'moving_average': moving_average,
+           'savgol': savgol,
+           'hysteresis': hysteresis}
+
+
+def filter_altitude(altitude, method='hysteresis', **kwargs):
+    """
+    Filter the altitude with one of the FILTERS, kwargs are passed to it.
+    """
+    try:
+        func = FILTERS[method]
+    except KeyError:
+        raise ValueError(f"Unknown altitude filter: {method}, use one of {list(FILTERS)}")
+    return func(altitude, **kwargs)
+
+
+def ascent_descent(altitude):
+    """
+    :return: (ascent, descent) the sum of the rises and of the drops, descent is negative. Missing values are
+    skipped.
+    """
+    altitude, valid = _valid(altitude)
+    change = np.diff(altitude[valid])
+    return change[change > 0].sum(), change[change < 0].sum()
@@ -0,0 +1,138 @@
+"""
+Score a whole rally event, every rider against the same segments.
+
+The segment definition is read once: the checkpoint locations, which segments are timed and the bounding box are
+kept as arrays and sent to each worker with the riders. Each rider's track gets one KD-tree that all the
+checkpoints are looked up in at once, see segments.find_checkpoints.
+
+    scorer = EventScorer(segments)
+    table = scorer.score('roubaix/', workers=8)
+    print(table[['total_timed', 'rank', 'error']])
+
+A rider that can not be scored, never got near a checkpoint or the file can not be read, gets a row with the
+error message and no times, the other riders are not affected.
+"""
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from . import readers, metrics
+    from .batch import find_files
+    from .exceptions import MatchCheckpointsException
+    from .segments import point_tree, checkpoint_points, find_checkpoints
+except:
+    import readers
+    import metrics
+    from batch import find_files
+    from exceptions import MatchCheckpointsException
+    from segments import point_tree, checkpoint_points, find_checkpoints
+
+
+def _segment_names(segments):
+    """A column name for each segment, repeated names get the segment number added"""
+    names = [str(s.get('Segment_name', s.get('segment_name', i))) for i, s in enumerate(segments)]
+    return [f"{i}: {n}" if names.count(n) > 1 else n for i, n in enumerate(names)]
+
+
+class EventScorer(object):
+    """
+    segments: the rally definition, see rallystyle.RallyResults
+    near, epsilon: see segments.find_checkpoints, the same defaults as RallyResults
+    """
+
+    def __init__(self, segments, near=.0002, epsilon=0.00001):
+        if len(segments) < 2:
+            raise ValueError("An event needs at least 2 segments, a start and a finish")
+        self.segments = segments
+        self.near = near
+        self.epsilon = epsilon
+        self.names = _segment_names(segments)
+        self.checkpoints = checkpoint_points(segments)
+        # Segment i is timed from checkpoint i to checkpoint i + 1, the last one is the finish
+        self.timed = np.array([s.get('type_name') == 'timed' for s in segments[:-1]], dtype=bool)
+        self.bounds = (self.checkpoints.min(axis=0), self.checkpoints.max(axis=0))
+
+    def match(self, df):
+        """
+        :return: the row position of the point matched to each checkpoint
+        """
+        latitude = df['Latitude'].to_numpy(dtype=np.float64)
+        longitude = df['Longitude'].to_numpy(dtype=np.float64)
+        low, high = self.bounds
+        with np.errstate(invalid='ignore'):
+            if not (np.nanmin(latitude) <= low[0] and np.nanmin(longitude) <= low[1]
+                    and np.nanmax(latitude) >= high[0] and np.nanmax(longitude) >= high[1]):
+                raise MatchCheckpointsException("This activity does not seem to be within the area of the event "
+                                                "segments")
+        return find_checkpoints(latitude, longitude, self.segments, near=self.near, epsilon=self.epsilon,
+                                tree=point_tree(latitude, longitude), checkpoints=self.checkpoints)
+
+    @metrics.timed('event.score_one')
+    def score_one(self, df):
+        """
+        Score one rider.
+        :return: dict, the duration of each segment by name, total_timed, start and finish times
+        """
+        times = df['Date_Time'].iloc[self.match(df)]
+        durations = pd.TimedeltaIndex(np.diff(times.values))
+        result = dict(zip(self.names[:-1], durations))
+        result['total_timed'] = durations[self.timed].sum()
+        result['start'] = times.iloc[0]
+        result['finish'] = times.iloc[-1]
+        return result
+
+    def _score_chunk(self, chunk, reader):
+        results = []
+        for name, item in chunk:
+            try:
+                df = item if isinstance(item, pd.DataFrame) else reader(item)
+                result = self.score_one(df)
+                result['error'] = None
+            except Exception as e:
+                result = {'error': f"{type(e).__name__}: {e}"}
+            result['rider'] = name
+            results.append(result)
+        return results
+
+    def score(self, riders, reader=readers.read, workers=None, chunksize=1):
+        """
+        Score every rider.
+        riders: dict {rider name: DataFrame or path}, or anything batch.find_files takes, then the file name
+            without the suffix is the rider name.
+        reader: function(path) -> DataFrame, used for the paths
+        workers: number of processes, default os.cpu_count(). With 0 everything runs in this process.
+        chunksize: number of riders sent to a worker at a time
+        :return: DataFrame, one row per rider, index rider. A timedelta column for each segment but the finish,
+            total_timed, start, finish, rank by total_timed (1 is the fastest, ties share a rank) and error.
+            Riders with an error have no times or rank.
+        """
+        if not isinstance(riders, dict):
+            riders = {os.path.splitext(os.path.basename(f))[0]: f for f in find_files(riders)}
+        items = list(riders.items())
+        chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+        results = []
+        if workers == 0:
+            for chunk in chunks:
+                results.extend(self._score_chunk(chunk, reader))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(self._score_chunk, chunk, reader) for chunk in chunks]
+                for future in as_completed(futures):
+                    results.extend(future.result())
+        return self.table(results, order=list(riders))
+
+    def table(self, results, order=None):
+        """
+        The results table from the score_one dicts, each with rider and error added.
+        order: the rider order of the rows, default the order of results
+        """
+        columns = self.names[:-1] + ['total_timed', 'start', 'finish']
+        table = pd.DataFrame(results, columns=['rider'] + columns + ['error']).set_index('rider')
+        if order is not None:
+            table = table.reindex(order)
+        for c in self.names[:-1] + ['total_timed']:
+            table[c] = pd.to_timedelta(table[c])
+        table.insert(len(columns), 'rank', table['total_timed'].rank(method='min').astype('Int64'))
+        return table
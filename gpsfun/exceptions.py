@@ -6,6 +6,18 @@ class GPSBabelException(GPSFunException):
     pass
 
 
+class GPSBabelNotFoundException(GPSBabelException, FileNotFoundError):
+    pass
+
+
+class GPSBabelInputException(GPSBabelException):
+    pass
+
+
+class GPSBabelTimeoutException(GPSBabelException):
+    pass
+
+
 ####
 # RallyStyle
 ####
@@ -23,3 +35,7 @@ class MatchCheckpointsException(RallyResultsException):
 
 class CalcResultsException(RallyResultsException):
     pass
+
+
+class GeocodeException(GPSFunException):
+    pass
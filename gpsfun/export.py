@@ -0,0 +1,172 @@
+"""
+Export tracks in bulk. Everything is built from whole columns, there is no python loop per point.
+
+file types:
+parquet, feather: all the columns, needs pyarrow (pip install pyarrow). The columns are handed to arrow without
+    a copy where the dtype allows it.
+geojson: a Feature with a LineString of [longitude, latitude, altitude]
+polyline: Google encoded polyline, https://developers.google.com/maps/documentation/utilities/polylinealgorithm
+npy: a numpy structured array, one field per column, Date_Time as int64 ns since the epoch
+csv: all the columns
+
+out: a path or a file object to write to, or None to get the bytes back (str for polyline).
+
+    export(df, 'geojson', 'ride.geojson', simplify=5)
+    data = export(df, 'parquet')
+"""
+import io
+import os
+import json
+import numpy as np
+import pandas as pd
+try:
+    from .exceptions import GPSFunException
+    from .simplify import simplify as simplify_track
+except:
+    from exceptions import GPSFunException
+    from simplify import simplify as simplify_track
+
+
+def _output(data, out):
+    """Write bytes to out, or return them if out is None"""
+    if out is None:
+        return data
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, 'wb') as f:
+            f.write(data)
+    else:
+        out.write(data)
+
+
+def _arrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise GPSFunException("pyarrow is needed for parquet and feather, pip install pyarrow")
+    return pyarrow
+
+
+def _positions(df):
+    return df[df['Latitude'].notna() & df['Longitude'].notna()]
+
+
+def records(df):
+    """
+    [{'longitude':, 'latitude':, 'altitude':}, ...] the altitude only if df has it
+    """
+    columns = {'Longitude': 'longitude', 'Latitude': 'latitude', 'Altitude': 'altitude'}
+    columns = {k: v for k, v in columns.items() if k in df.columns}
+    return df[list(columns)].rename(columns=columns).to_dict('records')
+
+
+def parquet(df, out=None):
+    pa = _arrow()
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if out is None:
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink)
+        return sink.getvalue().to_pybytes()
+    pq.write_table(table, os.fspath(out) if isinstance(out, os.PathLike) else out)
+
+
+def feather(df, out=None):
+    pa = _arrow()
+    import pyarrow.feather as pf
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if out is None:
+        sink = pa.BufferOutputStream()
+        pf.write_feather(table, sink)
+        return sink.getvalue().to_pybytes()
+    pf.write_feather(table, os.fspath(out) if isinstance(out, os.PathLike) else out)
+
+
+def geojson(df, out=None):
+    df = _positions(df)
+    columns = ['Longitude', 'Latitude'] + (['Altitude'] if 'Altitude' in df.columns else [])
+    coordinates = df[columns].to_numpy(dtype=np.float64)
+    if len(columns) == 3 and np.isnan(coordinates[:, 2]).any():
+        coordinates = coordinates[:, :2]
+    properties = {}
+    if 'Date_Time' in df.columns and len(df):
+        properties = {'start_time': df['Date_Time'].iloc[0].isoformat(),
+                      'end_time': df['Date_Time'].iloc[-1].isoformat()}
+    feature = {'type': 'Feature',
+               'geometry': {'type': 'LineString', 'coordinates': coordinates.round(7).tolist()},
+               'properties': properties}
+    return _output(json.dumps(feature).encode(), out)
+
+
+def encode_polyline(latitude, longitude, precision=5):
+    """
+    Google encoded polyline of the points, vectorized: every value is split into its 5 bit chunks in one
+    (n, 7) array and the chunks that are used are joined.
+    """
+    values = np.column_stack([latitude, longitude]).astype(np.float64)
+    values = np.round(values * 10 ** precision).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=0).ravel()
+    deltas = (deltas << 1) ^ (deltas >> 63)  # zigzag, negative values are odd
+    chunks = (deltas[:, None] >> (5 * np.arange(7))) & 0x1f
+    # Number of chunks of each value, at least 1
+    count = np.maximum(1, (np.floor(np.log2(np.maximum(deltas, 1))).astype(np.int64) // 5) + 1)
+    used = np.arange(7) < count[:, None]
+    more = np.arange(7) < count[:, None] - 1
+    chars = (chunks | np.where(more, 0x20, 0)) + 63
+    return chars[used].astype(np.uint8).tobytes().decode('ascii')
+
+
+def polyline(df, out=None, precision=5):
+    df = _positions(df)
+    encoded = encode_polyline(df['Latitude'].values, df['Longitude'].values, precision=precision)
+    if out is None:
+        return encoded
+    _output(encoded.encode('ascii'), out)
+
+
+def npy(df, out=None):
+    fields = {}
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            fields[c] = s.values.view(np.int64)
+        elif isinstance(s.dtype, pd.CategoricalDtype):
+            fields[c] = np.asarray(s.astype(s.cat.categories.dtype))
+        elif s.dtype.kind in 'biuf':
+            fields[c] = s.values
+    array = np.empty(len(df), dtype=[(c, v.dtype) for c, v in fields.items()])
+    for c, v in fields.items():
+        array[c] = v
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return _output(buffer.getvalue(), out)
+
+
+def csv(df, out=None):
+    return _output(df.to_csv(index=False).encode(), out)
+
+
+FORMATS = {'parquet': parquet,
+           'feather': feather,
+           'geojson': geojson,
+           'polyline': polyline,
+           'npy': npy,
+           'csv': csv}
+
+
+def export(df, file_type, out=None, columns=None, simplify=None, method='rdp', **kwargs):
+    """
+    file_type: one of FORMATS
+    out: path or file object, None returns the bytes (str for polyline)
+    columns: only export these columns
+    simplify: tolerance in meters, only the points simplify.simplify keeps are exported
+    method: the simplify method
+    """
+    try:
+        func = FORMATS[file_type]
+    except KeyError:
+        raise ValueError(f"Unknown export type: {file_type}, use one of {list(FORMATS)}")
+    if simplify is not None:
+        df = simplify_track(df, simplify, method=method)
+    if columns is not None:
+        df = df[list(columns)]
+    return func(df, out, **kwargs)
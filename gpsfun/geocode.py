@@ -0,0 +1,170 @@
+"""
+Reverse geocoding, "where" a ride was, with the mapbox places api.
+https://docs.mapbox.com/api/search/#reverse-geocoding
+
+One requests.Session is shared by all lookups so connections are reused, failed requests are retried with
+backoff, and results are kept in a sqlite cache by geohash cell, so rides that start at the same trailhead only
+make one request.
+
+    geocoder = Geocoder(token, cache=PlaceCache('places.sqlite'))
+    geocoder.place(39.4667, -105.2386)['place_name']
+    await geocoder.places([(39.4667, -105.2386), ...])  # at most max_concurrency requests at a time
+"""
+import json
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    from .exceptions import GeocodeException
+except:
+    from exceptions import GeocodeException
+
+_log = logging.getLogger(__name__)
+
+MAPBOX_URL = 'https://api.mapbox.com/geocoding/v5/mapbox.places'
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(latitude, longitude, precision=7):
+    """
+    Geohash of a point, precision 7 is a cell of about 150 x 150 meters.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    bits = []
+    for i in range(precision * 5):
+        value, r = (longitude, lon_range) if i % 2 == 0 else (latitude, lat_range)
+        middle = (r[0] + r[1]) / 2
+        if value >= middle:
+            bits.append(1)
+            r[0] = middle
+        else:
+            bits.append(0)
+            r[1] = middle
+    return ''.join(_BASE32[int(''.join(map(str, bits[i:i + 5])), 2)] for i in range(0, len(bits), 5))
+
+
+class PlaceCache(object):
+    """
+    sqlite cache of geocoder results by geohash cell, it is safe to use from several threads and processes.
+    path: sqlite file, ':memory:' for a cache that is not saved.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._lock, self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS places (cell TEXT PRIMARY KEY, place TEXT)')
+
+    def get(self, cell):
+        with self._lock:
+            row = self._db.execute('SELECT place FROM places WHERE cell = ?', (cell,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, cell, place):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO places VALUES (?, ?)', (cell, json.dumps(place)))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM places').fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+class Geocoder(object):
+    """
+    access_token: mapbox token
+    base_url: places endpoint, change it to use a different server
+    cache: PlaceCache, or None to always make the request
+    precision: geohash precision of the cache cells
+    max_concurrency: connection pool size and the number of lookups places() runs at once
+    retries, backoff_factor: failed connections and 429/5xx responses are retried, sleeping
+        backoff_factor * 2 ** retry seconds between tries
+    timeout: seconds to wait for the server
+    """
+
+    def __init__(self, access_token, base_url=MAPBOX_URL, cache=None, precision=7, max_concurrency=8,
+                 retries=3, backoff_factor=0.5, timeout=10):
+        self.access_token = access_token
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.precision = precision
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=['GET'])
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=max_concurrency)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = None
+
+    def _request(self, latitude, longitude):
+        url = f"{self.base_url}/{longitude},{latitude}.json"
+        params = {'access_token': self.access_token, 'types': 'place'}
+        try:
+            r = self.session.get(url, params=params, timeout=self.timeout)
+            r.raise_for_status()
+            place_info = r.json()
+        except (requests.RequestException, ValueError) as e:
+            raise GeocodeException(f"Reverse geocoding {latitude}, {longitude} failed: {e}") from e
+        features = place_info.get('features') or [{}]
+        return {'place_info': place_info, 'place_name': features[0].get('place_name')}
+
+    def place(self, latitude, longitude):
+        """
+        :return: {'place_info': the mapbox response, 'place_name': name of the first feature or None}
+        """
+        cell = geohash(latitude, longitude, self.precision)
+        if self.cache is not None:
+            place = self.cache.get(cell)
+            if place is not None:
+                return place
+        place = self._request(latitude, longitude)
+        if self.cache is not None:
+            self.cache.put(cell, place)
+        return place
+
+    async def place_async(self, latitude, longitude):
+        """
+        place() run in the geocoder thread pool, so it does not block the event loop.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix='geocoder')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.place, latitude, longitude)
+
+    async def places(self, points, return_exceptions=False):
+        """
+        points: [(latitude, longitude), ...]
+        return_exceptions: return a GeocodeException in place of a result instead of raising it
+        :return: list of place() results in the same order. Points in the same cache cell are only looked up once.
+        """
+        tasks = {}
+        for latitude, longitude in points:
+            cell = geohash(latitude, longitude, self.precision)
+            if cell not in tasks:
+                tasks[cell] = asyncio.ensure_future(self.place_async(latitude, longitude))
+        results = await asyncio.gather(*tasks.values(), return_exceptions=return_exceptions)
+        by_cell = dict(zip(tasks, results))
+        return [by_cell[geohash(latitude, longitude, self.precision)] for latitude, longitude in points]
+
+    def close(self):
+        self.session.close()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
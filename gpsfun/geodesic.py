@@ -0,0 +1,155 @@
+"""
+Vectorized distance calculations between gps points.
+
+All functions take numpy arrays (or anything np.asarray accepts) of latitude and longitude in degrees and
+return distances in meters. Points are assumed to be in the WGS84 coordinate system.
+
+Models:
+haversine: great circle distance on a sphere, this is what the haversine package computes.
+cosines: spherical law of cosines, same sphere as haversine. Loses precision for points less than about 1 meter
+    apart, float64 rounding makes it only good to about 0.5 meters.
+vincenty: Vincenty's inverse formula on the WGS84 ellipsoid. Points that do not converge (nearly antipodal)
+    fall back to the haversine distance.
+equirectangular: flat earth approximation around the mean latitude of each pair. Fastest, and for consecutive
+    points in an activity (meters apart) it differs from haversine by much less than a millimeter.
+
+Tolerance: haversine matches haversine.haversine(unit='m') to within 1e-6 meters per pair.
+"""
+import numpy as np
+
+EARTH_RADIUS = 6371008.8  # Mean earth radius in meters, same value the haversine package uses.
+WGS84_A = 6378137.0  # Semi-major axis in meters
+WGS84_F = 1 / 298.257223563  # Flattening
+WGS84_B = WGS84_A * (1 - WGS84_F)  # Semi-minor axis in meters
+
+
+def _radians(*arrays):
+    return [np.radians(np.asarray(a, dtype=np.float64)) for a in arrays]
+
+
+def haversine(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS):
+    """
+    Great circle distance in meters.
+    """
+    lat1, lon1, lat2, lon2 = _radians(lat1, lon1, lat2, lon2)
+    d = np.sin((lat2 - lat1) * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) * 0.5) ** 2
+    return 2 * radius * np.arcsin(np.sqrt(d))
+
+
+def cosines(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS):
+    """
+    Spherical law of cosines distance in meters.
+    """
+    lat1, lon1, lat2, lon2 = _radians(lat1, lon1, lat2, lon2)
+    c = np.sin(lat1) * np.sin(lat2) + np.cos(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+    return radius * np.arccos(np.clip(c, -1.0, 1.0))
+
+
+def equirectangular(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS):
+    """
+    Equirectangular (local flat earth) distance in meters. Only use for points that are close together.
+    """
+    lat1, lon1, lat2, lon2 = _radians(lat1, lon1, lat2, lon2)
+    x = (lon2 - lon1) * np.cos((lat1 + lat2) * 0.5)
+    y = lat2 - lat1
+    return radius * np.sqrt(x * x + y * y)
+
+
+def vincenty(lat1, lon1, lat2, lon2, max_iter=200, tol=1e-12):
+    """
+    Vincenty inverse formula on the WGS84 ellipsoid, distance in meters.
+    The iteration runs on the whole array, points drop out once they have converged.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*_radians(lat1, lon1, lat2, lon2))
+    shape = lat1.shape
+    lat1, lon1, lat2, lon2 = [np.atleast_1d(x).ravel() for x in (lat1, lon1, lat2, lon2)]
+    a, b, f = WGS84_A, WGS84_B, WGS84_F
+    L = lon2 - lon1
+    U1 = np.arctan((1 - f) * np.tan(lat1))
+    U2 = np.arctan((1 - f) * np.tan(lat2))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    sin_sigma = np.zeros_like(L)
+    cos_sigma = np.ones_like(L)
+    sigma = np.zeros_like(L)
+    cos_sq_alpha = np.ones_like(L)
+    cos_2sigma_m = np.zeros_like(L)
+    active = np.ones(L.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iter):
+            if not active.any():
+                break
+            lam_a = lam[active]
+            s1, c1, s2, c2 = sinU1[active], cosU1[active], sinU2[active], cosU2[active]
+            sin_lam, cos_lam = np.sin(lam_a), np.cos(lam_a)
+            ss = np.sqrt((c2 * sin_lam) ** 2 + (c1 * s2 - s1 * c2 * cos_lam) ** 2)
+            cs = s1 * s2 + c1 * c2 * cos_lam
+            sg = np.arctan2(ss, cs)
+            sin_alpha = np.where(ss == 0, 0.0, c1 * c2 * sin_lam / ss)
+            csa = 1 - sin_alpha ** 2
+            # cos_sq_alpha is 0 for points on the equator
+            c2sm = np.where(csa == 0, 0.0, cs - 2 * s1 * s2 / csa)
+            C = f / 16 * csa * (4 + f * (4 - 3 * csa))
+            lam_new = L[active] + (1 - C) * f * sin_alpha * (
+                sg + C * ss * (c2sm + C * cs * (-1 + 2 * c2sm ** 2)))
+
+            sin_sigma[active], cos_sigma[active], sigma[active] = ss, cs, sg
+            cos_sq_alpha[active], cos_2sigma_m[active] = csa, c2sm
+            lam[active] = lam_new
+            converged = np.abs(lam_new - lam_a) <= tol
+            idx = np.flatnonzero(active)
+            active[idx[converged]] = False
+
+        u_sq = cos_sq_alpha * (a ** 2 - b ** 2) / b ** 2
+        A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+            B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        s = b * A * (sigma - delta_sigma)
+
+    # Nearly antipodal points do not converge, use the great circle distance for those.
+    failed = active | ~np.isfinite(s)
+    if failed.any():
+        s = np.where(failed, haversine(np.degrees(lat1), np.degrees(lon1), np.degrees(lat2), np.degrees(lon2)), s)
+    # nan in, nan out
+    s = np.where(np.isnan(L) | np.isnan(U1) | np.isnan(U2), np.nan, s)
+    return s.reshape(shape) if shape else s[0]
+
+
+METHODS = {'haversine': haversine,
+           'cosines': cosines,
+           'vincenty': vincenty,
+           'equirectangular': equirectangular}
+
+
+def distance(lat1, lon1, lat2, lon2, method='haversine'):
+    """
+    Distance in meters between two sets of points using one of the METHODS
+    """
+    try:
+        func = METHODS[method]
+    except KeyError:
+        raise ValueError(f"Unknown distance method: {method}, use one of {list(METHODS)}")
+    return func(lat1, lon1, lat2, lon2)
+
+
+def distance_between(latitude, longitude, altitude=None, method='haversine'):
+    """
+    Distance in meters between each point and the point before it. The first value is nan.
+    If altitude is given the altitude change is included, sqrt(flat_distance**2 + altitude_change**2). Where the
+    altitude of either point is missing it is the flat distance.
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    result = np.full(latitude.shape, np.nan)
+    if latitude.size < 2:
+        return result
+    flat = distance(latitude[:-1], longitude[:-1], latitude[1:], longitude[1:], method=method)
+    if altitude is not None:
+        altitude_change = np.diff(np.asarray(altitude, dtype=np.float64))
+        flat = np.where(np.isnan(altitude_change), flat, np.sqrt(flat ** 2 + altitude_change ** 2))
+    result[1:] = flat
+    return result
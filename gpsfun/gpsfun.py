@@ -1,26 +1,105 @@
 """Mostly fuctions used elsewere"""
+import numpy as np
+import pandas as pd
+try:
+    from . import geodesic
+except:
+    import geodesic
 
-def increase_points(df, freq='250L', slice=(None,None), columns=None):
+
+def _step(step, by):
+    """The step in ns for time, '250ms', pd.Timedelta or seconds, or in meters for distance"""
+    if by == 'time':
+        if isinstance(step, (int, float)):
+            return step * 1e9
+        return float(pd.Timedelta(step).value)
+    return float(step)
+
+
+def _axis(df, by):
+    """
+    The values to resample over as float64, ns from the first point for time, meters for distance.
+    The Distance column is used if it is in df, otherwise the distance is calculated like Track.cumulative_distance.
+    """
+    if by == 'time':
+        t = df['Date_Time'].values.view(np.int64).astype(np.float64)
+        t[np.isnat(df['Date_Time'].values)] = np.nan
+        return t - t[np.isfinite(t)][0] if np.isfinite(t).any() else t
+    if by == 'distance':
+        if 'Distance' in df.columns:
+            return df['Distance'].to_numpy(dtype=np.float64)
+        altitude = df['Altitude'].values if 'Altitude' in df.columns else None
+        between = geodesic.distance_between(df['Latitude'].values, df['Longitude'].values, altitude)
+        return np.nancumsum(between)
+    raise ValueError(f"by must be 'time' or 'distance', not {by}")
+
+
+def resample(df, step, by='time', columns=None, keep_points=False):
+    """
+    Resample a track to a fixed time or distance step by linear interpolation, all columns in one pass.
+    step: for by='time' seconds, a pd.Timedelta or a string like '250ms'. For by='distance' meters.
+    by: 'time' or 'distance'. For distance the Distance column is used if it is there, otherwise it is calculated
+        and added to the result.
+    columns: the columns to keep, default all. Numeric columns are interpolated, the others (lap, text) take the
+        value of the point at or before. Cumulative columns like Distance are interpolated like any other, they
+        only make sense that way, never interpolate per point differences.
+    keep_points: also keep the original points, so the result is the original track with points added.
+    Missing values are interpolated from the points that have a value.
+    :return: new DataFrame, df is not changed
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    x = _axis(df, by)
+    valid = np.isfinite(x)
+    xv = x[valid]
+    if len(xv) == 0:
+        return df.iloc[:0][columns]
+    start, stop = xv[0], xv[-1]
+    step = _step(step, by)
+    grid = start + step * np.arange(int(np.floor((stop - start) / step)) + 1)
+    if keep_points:
+        grid = np.union1d(grid, xv)
+    # For the columns that are not interpolated
+    before = np.clip(np.searchsorted(xv, grid, side='right') - 1, 0, len(xv) - 1)
+    rows = np.flatnonzero(valid)[before]
+
+    out = {}
+    if by == 'distance' and 'Distance' not in columns:
+        columns.append('Distance')
+    for c in columns:
+        if c == 'Distance' and by == 'distance':
+            out[c] = grid
+            continue
+        s = df[c]
+        if c == 'Date_Time':
+            t = s.values.view(np.int64)[valid].astype(np.float64)
+            if by == 'time':
+                values = s.values[valid][0] + grid.astype(np.int64).astype('timedelta64[ns]')
+            else:
+                values = (t[0] + np.interp(grid, xv, t - t[0])).astype(np.int64).astype('datetime64[ns]')
+            values = pd.DatetimeIndex(values)
+            tz = getattr(s.dtype, 'tz', None)
+            out[c] = values.tz_localize('UTC').tz_convert(tz) if tz else values
+        elif pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+            fp = s.to_numpy(dtype=np.float64)[valid]
+            ok = ~np.isnan(fp)
+            values = np.interp(grid, xv[ok], fp[ok]) if ok.any() else np.full(grid.shape, np.nan)
+            if s.dtype.kind == 'f':
+                values = values.astype(s.dtype)
+            elif s.dtype.kind in 'iu':
+                values = np.round(values).astype(s.dtype)
+            out[c] = values
+        else:
+            out[c] = s.iloc[rows].values
+    return pd.DataFrame(out, columns=columns)
+
+
+def increase_points(df, freq='250ms', slice=(None, None), columns=None):
     """
-    TODO WORK IN PROGRESS
-    Need to be carefull and only include columns that it is meaningfull to interpilate between
-    freq: 250L is 250 milliseconds
-    Columns: you need to be sure the columns are not cumulative or is some other way derived from other when interpilating.
-    :param df:
-    :return:
+    Add points between the points of df every freq, the original points are kept.
+    freq: '250ms' is 250 milliseconds, see resample
+    slice: only use the rows df.iloc[slice[0]:slice[1]]
+    columns: default Date_Time, Latitude, Longitude and Altitude if they are there, see resample
     """
-    if columns == None:
-        columns = ['Date_Time', 'Latitude', 'Longitude', 'Altitude']
-    df1 = df[columns][100:200].copy()
-    # TODO if we are only using Date_Time as the index then this is not needed.
-    df1.set_index(pd.DatetimeIndex(df1['Date_Time']), drop=True, inplace=True)
-    df1.drop('Date_Time', axis=1, inplace=True)
-    # df1.reset_index(drop=True, inplace=True)
-    print(df1[9:13].head(25))
-
-    ups = df1[10:20].resample('250L').asfreq().interpolate(method='linear', limit_direction='forward', axis=0)
-    df1 = df1.append(ups)
-    df1.sort_index(inplace=True)
-    # df1.reset_index(drop=True, inplace=True)
-
-    print(df1[9:20].head(25))
+    if columns is None:
+        columns = [c for c in ['Date_Time', 'Latitude', 'Longitude', 'Altitude'] if c in df.columns]
+    return resample(df.iloc[slice[0]:slice[1]], freq, by='time', columns=columns, keep_points=True)
@@ -0,0 +1,257 @@
+"""
+Stage timings for readers, Track, RallyResults and TicTocResults.
+
+A hook is a function that gets a dict for each stage that finishes:
+    {'stage': 'readers.gpx', 'parent': 'readers.read' or None, 'seconds': 0.031, 'points': 2504 or None,
+     'bytes': 529308 or None, 'peak_bytes': None, 'error': None or the exception class name}
+points is the number of track points, bytes the size of the file read. peak_bytes is the most memory allocated
+during the stage, it is only measured with trace_memory(True) because tracemalloc slows everything down.
+
+With no hooks added a stage costs one check of the hook list.
+
+    metrics.add_hook(metrics.LoggingHook())
+    counters = metrics.Counters()
+    metrics.add_hook(counters)
+    ...
+    print(counters.expose())  # Prometheus text format
+
+    with metrics.collect() as events:
+        Track(read('ride.fit')).calculate
+"""
+import os
+import time
+import logging
+import functools
+import threading
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+
+_log = logging.getLogger(__name__)
+
+_hooks = ()  # replaced, never changed, so it can be read without the lock
+_lock = threading.Lock()
+_memory = False
+_current = contextvars.ContextVar('gpsfun_stage', default=None)
+
+
+def add_hook(hook):
+    """hook: function(event dict)"""
+    global _hooks
+    with _lock:
+        _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook):
+    global _hooks
+    with _lock:
+        _hooks = tuple(h for h in _hooks if h != hook)
+
+
+def enabled():
+    return bool(_hooks)
+
+
+def trace_memory(on=True):
+    """Measure peak_bytes for every stage with tracemalloc"""
+    global _memory
+    _memory = on
+    if on and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not on and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+@contextmanager
+def collect():
+    """Collect the events in a list while in the with block"""
+    events = []
+    add_hook(events.append)
+    try:
+        yield events
+    finally:
+        remove_hook(events.append)
+
+
+def _emit(event):
+    for hook in _hooks:
+        try:
+            hook(event)
+        except Exception:
+            _log.exception(f"metrics hook {hook} failed")
+
+
+class Stage(object):
+    """
+    One running stage, set points and bytes when they are known.
+    """
+
+    def __init__(self, name, points=None, bytes=None):
+        self.name = name
+        self.points = points
+        self.bytes = bytes
+        self.parent = None
+        self.child_peak = 0
+        self._memory_start = None
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        if _memory and tracemalloc.is_tracing():
+            self._memory_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        _current.reset(self._token)
+        peak = None
+        if self._memory_start is not None and tracemalloc.is_tracing():
+            # A child stage resets the peak, so the highest of the children counts too
+            absolute = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            if self.parent is not None:
+                self.parent.child_peak = max(self.parent.child_peak, absolute)
+            peak = absolute - self._memory_start
+        _emit({'stage': self.name,
+               'parent': self.parent.name if self.parent is not None else None,
+               'seconds': seconds,
+               'points': self.points,
+               'bytes': self.bytes,
+               'peak_bytes': peak,
+               'error': exc_type.__name__ if exc_type is not None else None})
+        return False
+
+
+class _NoStage(object):
+    """Used when there are no hooks, nothing is measured"""
+    name = points = bytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name, points=None, bytes=None):
+    """
+    with stage('readers.gpsbabel.subprocess') as s:
+        ...
+        s.points = len(df)
+    """
+    if not _hooks:
+        return _NO_STAGE
+    return Stage(name, points, bytes)
+
+
+def _size(source):
+    """The size of a path or bytes, None for anything else"""
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            return os.path.getsize(source)
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return len(source)
+    except (OSError, TypeError):
+        pass
+    return None
+
+
+def _tell(source):
+    try:
+        return source.tell()
+    except Exception:
+        return None
+
+
+def _points(args, result):
+    """len of a DataFrame result, or of the df of the object a method was called on"""
+    if hasattr(result, 'columns') and hasattr(result, '__len__'):
+        return len(result)
+    df = getattr(args[0], 'df', None) if args else None
+    return len(df) if df is not None and hasattr(df, 'columns') else None
+
+
+def timed(name):
+    """
+    Decorator, each call is a stage. points is the length of a DataFrame result or of self.df, bytes is the size
+    of the file read when the first argument is a path, bytes or a file object.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return func(*args, **kwargs)
+            source = args[0] if args else None
+            with Stage(name, bytes=_size(source)) as s:
+                start = _tell(source) if s.bytes is None and hasattr(source, 'read') else None
+                result = func(*args, **kwargs)
+                if start is not None:
+                    end = _tell(source)
+                    s.bytes = end - start if end is not None else None
+                s.points = _points(args, result)
+            return result
+        return wrapper
+    return decorator
+
+
+class LoggingHook(object):
+    """Log each stage, at level, to logger or the gpsfun.metrics logger"""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or _log
+        self.level = level
+
+    def __call__(self, event):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        extra = ''.join(f" {k}={event[k]}" for k in ('points', 'bytes', 'peak_bytes', 'parent', 'error')
+                        if event[k] is not None)
+        self.logger.log(self.level, f"{event['stage']} {event['seconds'] * 1000:.2f} ms{extra}")
+
+
+class Counters(object):
+    """
+    Prometheus style counters by stage:
+    {prefix}_stage_calls_total, {prefix}_stage_errors_total, {prefix}_stage_seconds_total, {prefix}_points_total,
+    {prefix}_bytes_total, and the gauge {prefix}_stage_peak_bytes, the largest seen.
+    expose() is the Prometheus text format, to serve or push. For prometheus_client use a hook that updates its own
+    metrics from the event, these only need the standard library.
+    """
+    names = ('stage_calls_total', 'stage_errors_total', 'stage_seconds_total', 'points_total', 'bytes_total',
+             'stage_peak_bytes')
+
+    def __init__(self, prefix='gpsfun'):
+        self.prefix = prefix
+        self.values = {n: {} for n in self.names}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        name = event['stage']
+        with self._lock:
+            v = self.values
+            v['stage_calls_total'][name] = v['stage_calls_total'].get(name, 0) + 1
+            v['stage_seconds_total'][name] = v['stage_seconds_total'].get(name, 0.0) + event['seconds']
+            if event['error'] is not None:
+                v['stage_errors_total'][name] = v['stage_errors_total'].get(name, 0) + 1
+            for key, metric in (('points', 'points_total'), ('bytes', 'bytes_total')):
+                if event[key] is not None:
+                    v[metric][name] = v[metric].get(name, 0) + event[key]
+            if event['peak_bytes'] is not None:
+                v['stage_peak_bytes'][name] = max(v['stage_peak_bytes'].get(name, 0), event['peak_bytes'])
+
+    def expose(self):
+        lines = []
+        with self._lock:
+            for metric in self.names:
+                full = f"{self.prefix}_{metric}"
+                lines.append(f"# TYPE {full} {'gauge' if metric == 'stage_peak_bytes' else 'counter'}")
+                for name, value in sorted(self.values[metric].items()):
+                    lines.append(f'{full}{{stage="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,64 @@
+"""
+Moving time methods. Each takes the seconds and meters between each point and the point before it, the first
+values are nan, and returns a bool array, True for the gaps that count as moving time. Everything is one numpy
+pass, the speeds come from the real time between points so they work for any recording interval.
+
+simple: moved at least min_movement meters, only right for 1 second recording.
+speed: average speed over the gap is at least min_speed m/s.
+pause: like speed, but slow gaps only count as stopped when they add up to a pause of at least min_pause
+    seconds, so slowing down for a corner or a light is still moving.
+auto_pause: what a device auto pause does, it stops when the speed drops under pause_speed and starts again when
+    it gets over resume_speed.
+"""
+import numpy as np
+
+
+def _speed(seconds, meters):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return meters / seconds
+
+
+def simple(seconds, meters, min_movement=0.05):
+    return ~(meters < min_movement)
+
+
+def speed(seconds, meters, min_speed=0.5):
+    return ~(_speed(seconds, meters) < min_speed)
+
+
+def pause(seconds, meters, min_speed=0.5, min_pause=30):
+    slow = _speed(seconds, meters) < min_speed
+    # Number the runs of slow gaps and add up the time in each
+    starts = slow & ~np.concatenate([[False], slow[:-1]])
+    run = np.cumsum(starts)
+    run_seconds = np.bincount(run, weights=np.where(slow, np.nan_to_num(seconds), 0.0))
+    paused = slow & (run_seconds[run] >= min_pause)
+    return ~paused
+
+
+def auto_pause(seconds, meters, pause_speed=0.9, resume_speed=1.4):
+    v = _speed(seconds, meters)
+    moving = v >= resume_speed
+    decided = moving | (v < pause_speed)
+    # Between the two speeds the state from the last decided gap carries on, it starts as moving
+    last = np.maximum.accumulate(np.where(decided, np.arange(len(v)), -1))
+    return np.where(last >= 0, moving[np.maximum(last, 0)], True)
+
+
+METHODS = {'simple': simple,
+           'speed': speed,
+           'pause': pause,
+           'auto_pause': auto_pause}
+
+
+def moving(seconds, meters, method='simple', **kwargs):
+    """
+    seconds, meters: time and distance from the point before
+    method: one of METHODS, kwargs are passed to it
+    :return: bool array, True where the gap is moving time
+    """
+    try:
+        func = METHODS[method]
+    except KeyError:
+        raise ValueError(f"Unknown moving time method: {method}, use one of {list(METHODS)}")
+    return func(np.asarray(seconds, dtype=np.float64), np.asarray(meters, dtype=np.float64), **kwargs)
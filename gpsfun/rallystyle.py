@@ -1,10 +1,14 @@
-import numpy as np
 from datetime import timedelta
 
 try:
     from .exceptions import RallyStyleException, RallyResultsException, MatchCheckpointsException, CalcResultsException
+    from .segments import find_checkpoints
+    from . import export, metrics
 except:
     from exceptions import RallyStyleException, RallyResultsException, MatchCheckpointsException, CalcResultsException
+    from segments import find_checkpoints
+    import export
+    import metrics
 
 
 class RallyResults(object):
@@ -47,14 +51,7 @@ class RallyResults(object):
         self.results = []
         # self.ck_points = pd.DataFrame([p['location'] for p in segments], columns=['Latitude', 'Longitude'])
         self.ck_points = [p['location'] for p in segments]
-        if not 'shift_Longitude' in self.df.columns:
-            self.df['shift_Longitude'] = self.df.shift(-1)['Longitude']
-        if not 'shift_Latitude' in self.df.columns:
-            self.df['shift_Latitude'] = self.df.shift(-1)['Latitude']
-        # TODO It looks like we need to use this below instead os "to_next"
-        if not 'dist_to_next' in self.df.columns:
-            self.df['dist_to_next'] = np.linalg.norm(self.df[['Latitude', 'Longitude']].values -
-                                                     self.df[['shift_Latitude', 'shift_Longitude']].values, axis=1)
+        self.checkpoints = None  # row position of the activity point matched to each checkpoint
 
     def check_bounds(self):
         latmax = min([ck['lat'] for ck in self.ck_points]) >= self.df.Latitude.min()
@@ -63,59 +60,37 @@ class RallyResults(object):
         lonmin = max([ck['lon'] for ck in self.ck_points]) <= self.df.Longitude.max()
         assert latmax and lonmax and latmin and lonmin, "This activity does not seem to be within the area of the event segments"
 
-    # TODO Use checkpoints module
+    @metrics.timed('rally.match_checkpoints')
     def match_checkpoints(self):
         """
         Identify the activity point the represents the arrival at the checkpoint
-        find near points that form acute triangles
+        find near points that form acute triangles, see segments.find_checkpoints
+        self.df is not changed.
+        :return: list of row positions, one per checkpoint
         """
         self.check_bounds()
-        # the norm is the distance between two points.
-        self.df['to_next'] = np.linalg.norm(self.df[['Latitude', 'Longitude']].values -
-                                            self.df[['shift_Latitude', 'shift_Longitude']].values, axis=1)
-        # self.df['checkpoint'] = np.nan
-        row_slice = 0
-        for i, ck in enumerate(self.ck_points):
-            try:
-                point = (ck['lat'], ck['lon'])
-                # Calculate the distance from the chekpoint to all consecutive points in the data.
-                self.df[f'ck_to_A{i}'] = np.linalg.norm(self.df[['Latitude', 'Longitude']].values - point, axis=1)
-                self.df[f'ck_to_B{i}'] = np.linalg.norm(self.df[['shift_Latitude', 'shift_Longitude']].values - point,
-                                                        axis=1)
-                if self.df[f'ck_to_A{i}'].min() > self.near * 10:
-                    raise MatchCheckpointsException(
-                        f"It appears you never made it close to checkpoint {self.segments['segment_name']}")
-                # Acute, For ck "i" if the angle between the lines ck:A and A:B acute. If so then ck is "between" A and B
-                # Epislon is the fudge factor
-                self.df['acute'] = self.df[f'ck_to_A{i}'] ** 2 + self.df['to_next'] ** 2 <= self.df[
-                    f'ck_to_B{i}'] ** 2 + self.epsilon
-
-                self.df.loc[
-                    self.df[row_slice:][(self.df[row_slice:][f'ck_to_A{i}'] <= self.near) &
-                                        (self.df[row_slice:].acute)].index[0], ['checkpoint']] = i
-                row_slice = int(self.df[self.df.checkpoint == i].index[0])
-                self.df['seg_duration'] = self.df[self.df.checkpoint >= 0]['Date_Time'].diff()
-            except Exception as e:
-                raise MatchCheckpointsException(
-                    f"Fail on checkpoint:{i} location: {ck}\nDataframe columns:\n{self.df.columns}")
-
-        self.df['seg_duration'] = self.df[self.df.checkpoint >= 0]['Date_Time'].diff()
-        self.df['segment'] = self.df.checkpoint.fillna(method='ffill')
-        self.df['segment'][self.df.segment >= len(self.ck_points) - 1] = np.nan
+        try:
+            self.checkpoints = find_checkpoints(self.df['Latitude'].values, self.df['Longitude'].values,
+                                                self.segments, near=self.near, epsilon=self.epsilon)
+        except MatchCheckpointsException as e:
+            raise MatchCheckpointsException(f"{e}\nDataframe columns:\n{self.df.columns}")
+        return self.checkpoints
 
+    @metrics.timed('rally.calc_results')
     def calc_results(self):
         """
         calculate and return results
         """
+        if self.checkpoints is None:
+            self.match_checkpoints()
+        date_times = self.df['Date_Time'].iloc[self.checkpoints].to_list()
+        self.results = []
         total_timed = timedelta(seconds=0)
         for i, s in enumerate(self.segments[:-1]):
             r = s.copy()
-            # print(i, s)
-            duration = self.df.loc[self.df.checkpoint == i + 1]['seg_duration'].to_list()[0]
-            date_time = self.df.loc[self.df.checkpoint == i]['Date_Time'].to_list()[0]
+            duration = date_times[i + 1] - date_times[i]
             r['duration'] = duration
-            # self.segments[i]['date_time'] = date_time
-            r['date_time'] = date_time
+            r['date_time'] = date_times[i]
             if s['type_name'] == 'timed':
                 total_timed = total_timed + duration
                 r['total_timed'] = total_timed
@@ -123,20 +98,26 @@ class RallyResults(object):
                 r['total_timed'] = total_timed
             self.results.append(r)
 
-        date_time = self.df.loc[self.df.checkpoint == (len(self.segments) - 1)]['Date_Time'].to_list()[0]
         self.results.append(self.segments[-1])
         self.results[-1]['duration'] = None
-        self.results[-1]['date_time'] = date_time
+        self.results[-1]['date_time'] = date_times[-1]
         self.results[-1]['total_timed'] = total_timed
 
         return self.results
 
-    def export_lat_lon_alt(self, file_type='JSON'):
+    def export_lat_lon_alt(self, file_type='JSON', out=None):
         """
         export the latitude and longitude
-        :return: file
+        out: for csv, a path or file object, None returns the bytes
+        :return: list of dicts for JSON
         """
         if file_type == 'JSON':
-            return [dict(longitude=r.Longitude, latitude=r.Latitude, altitude=r.Altitude) for r in self.df.itertuples()]
+            return export.records(self.df)
         elif file_type == 'csv':
-            self.df[['Latitude', 'Longitude']].to_csv('export.csv')
+            return export.csv(self.df[['Latitude', 'Longitude']], out)
+
+    def export(self, file_type, out=None, **kwargs):
+        """
+        Export df, see export.export for the file types and arguments
+        """
+        return export.export(self.df, file_type, out, **kwargs)
@@ -1,179 +1,628 @@
+import io
 import os
+import logging
+import inspect
+import functools
+import numpy as np
 import pandas as pd
+import shutil
 import subprocess
+import threading
 import gzip
+from concurrent.futures import ThreadPoolExecutor
 from zipfile import ZipFile
-import tempfile
 from pathlib import Path
-import xmltodict
-import fitdecode
+from xml.etree import ElementTree
 try:
-    from .exceptions import GPSBabelException, GPSFunException
+    from .exceptions import GPSBabelNotFoundException, GPSBabelInputException, GPSBabelTimeoutException, GPSFunException
 except:
-    from exceptions import GPSBabelException, GPSFunException
+    from exceptions import GPSBabelNotFoundException, GPSBabelInputException, GPSBabelTimeoutException, GPSFunException
 
 try:
-    from . import col
+    from . import col, metrics
 except:
     import col
+    import metrics
 
-def _gpsbabel_proc(cmd, infile, outfile):
-    process = subprocess.Popen(
-        ['gpsbabel', '-t', '-i', f"{cmd}", '-f', infile, '-o', 'unicsv', '-F', outfile],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    stdout, stderr = process.communicate()
-    return stdout, stderr
-
-
-def _gpsbabel(file_path, file_ext):
-    file_cmd = {'.gpx': 'gpx', '.fit': 'garmin_fit', '.tcx': 'gtrnctr'}
-    with tempfile.TemporaryDirectory() as temp_csv_path:
-        csv_file_path = os.path.join(temp_csv_path, 'gps_file.csv')
-        stdout, stderr = _gpsbabel_proc(file_cmd[file_ext], file_path, csv_file_path)
-        if stderr:
-            raise GPSBabelException(stderr)
-        # TODO: check the errors here
-        try:
-            df = pd.read_csv(csv_file_path, parse_dates=[['Date', 'Time']])
-        except:
-            # TODO Need to check if there are dates
-            df = pd.read_csv(csv_file_path)
-    return df
+_log = logging.getLogger(__name__)
 
+SEMICIRCLES_TO_DEGREES = 180 / 2 ** 31
+FIT_EPOCH = pd.Timestamp('1989-12-31', tz='UTC')  # FIT timestamps are seconds since this
+# Change this when a reader returns something different, so cached results are not used.
+READER_VERSION = 4
 
-def gpsbabel(in_file, file_ext=None):
+
+def _cacheable(reader):
     """
-    gpsbabel -t -i garmin_fit -f {fit_file} -o unicsv -F {csv_file}
-    gpsbabel -t -i gpx -f {gpx_file} -o unicsv -F {csv_file}
-    gpsbabel -t -i gtrnctr -f {tcx_file} -o unicsv -F {csv_file}
-    TODO Consider dealing with zip files of each
+    Adds a cache argument to a reader, see cache.ParseCache. The cache key is the file content, the reader,
+    READER_VERSION and the arguments that change the result, timeout does not. Calls asking for laps or a session
+    are not cached. A file object is left at the position it was at.
     """
-    def handle_fileobject(in_file, file_ext):
-        file_ext = file_ext or Path(in_file.name).suffixes[-1].lower()
-        with tempfile.NamedTemporaryFile(delete=True) as temp_gps:
-            temp_gps.write(in_file.read())
-            in_file.seek(0)
-            temp_gps.flush()
-            return _gpsbabel(temp_gps.name, file_ext=file_ext)
+    signature = inspect.signature(reader)
 
-    if isinstance(in_file, str): # If it is a str, assume this means it is a path
-        file_ext = file_ext or Path(in_file).suffixes[-1].lower()
-        if file_ext == '.gz':
-            with gzip.open(in_file, 'rb') as f_in:
-                file_ext2 = Path(in_file).suffixes[-2].lower()
-                df = handle_fileobject(f_in, file_ext2)
-        elif file_ext == '.zip':
-            with ZipFile(in_file) as myz:
-                for name in myz.namelist():
-                    if Path(name).suffixes[-1].lower() in ['.fit', '.gpx', '.tcx']:
-                        with myz.open(name) as zfile:
-                            file_ext2 = Path(name).suffixes[-1].lower()
-                            df = handle_fileobject(zfile, file_ext2)
-                        break
+    @functools.wraps(reader)
+    def wrapper(in_file, *args, cache=None, **kwargs):
+        if cache is None:
+            return reader(in_file, *args, **kwargs)
+        # Positional and keyword arguments, and the defaults, give the same key
+        bound = signature.bind(in_file, *args, **kwargs)
+        bound.apply_defaults()
+        options = {k: v for k, v in list(bound.arguments.items())[1:] if k != 'timeout'}
+        if options.get('laps') or options.get('session'):
+            return reader(in_file, *args, **kwargs)
+        if isinstance(in_file, (str, os.PathLike)):
+            with open(in_file, 'rb') as f:
+                data = f.read()
+            name = os.fspath(in_file)
+        else:
+            position = in_file.tell() if in_file.seekable() else None
+            data = in_file.read()
+            if position is not None:
+                in_file.seek(position)
+            name = getattr(in_file, 'name', None)
+            # The reader still needs the file, give it a copy
+            in_file = io.BytesIO(data)
+            in_file.name = name
+        # The name only matters for the file type
+        key = cache.key(data, reader.__name__, READER_VERSION, name and Path(name).suffixes[-2:], options)
+        df = cache.get(key)
+        if df is None:
+            df = reader(in_file, *args, **kwargs)
+            cache.put(key, df)
+        return df
+    return wrapper
+
+
+def compact(df):
+    """
+    Convert the columns in col.schema to the schema dtype, other columns are not changed.
+    Naive Date_Time values are taken to be UTC.
+    :return: df, converted in place
+    """
+    for c, dtype in col.schema.items():
+        if c not in df.columns or str(df[c].dtype) == dtype:
+            continue
+        if c == 'Date_Time':
+            values = pd.to_datetime(df[c], utc=True)
+        elif dtype == 'category':
+            values = df[c].astype('category')
         else:
-            df = _gpsbabel(in_file, file_ext=file_ext)
-    else: # assume it is a file object type
-            df = handle_fileobject(in_file, file_ext)
+            values = pd.to_numeric(df[c], errors='coerce').astype(dtype)
+        df[c] = values
     return df
 
 
-def tcx(tcxfile):
-    '''
-    Using xmltodict
-    '''
-    df = pd.DataFrame()
-    with open(tcxfile, 'rb') as t:
-        tcx = xmltodict.parse(t) # This is slow
-    assert 'TrainingCenterDatabase' in tcx.keys()
-    activity = tcx['TrainingCenterDatabase']['Activities']['Activity']
-    # sport = activity['@Sport'] or None
-    # Id = activity['Id'] or None
-    # creator = activity['Creator'] or None
-    laps = activity['Lap']
-    # TODO Parse lap metrics
-    if isinstance(laps, list):
-        all_track_points = []
-        for n, l in enumerate(laps):
-            for t in l['Track']['Trackpoint']:
-                t['lap'] = n
-                all_track_points.append(t)
-        df = pd.DataFrame(all_track_points)
-    elif isinstance(laps, dict):
-        df = pd.DataFrame(laps['Track']['Trackpoint'])
-    # TODO, seperate the location and other columns
-    df = pd.concat([df, pd.json_normalize(df['Position'])], axis=1)
+class _Arrays(dict):
+    """The arrays of _Columns, a column is only allocated when it is first written"""
+
+    def __init__(self, columns):
+        super().__init__()
+        self.owner = columns
+
+    def __missing__(self, name):
+        a = self[name] = self.owner._empty(self.owner.dtypes[name], self.owner.capacity)
+        return a
+
+
+class _Columns(object):
+    """
+    Typed numpy columns that are filled one row at a time, the capacity doubles when full.
+    Float columns start as nan and object columns as None, so missing values do not need to be written. The
+    optional columns that are not in the file are never allocated.
+    """
+
+    def __init__(self, dtypes, capacity=4096):
+        self.dtypes = dtypes
+        self.size = 0
+        self.capacity = capacity
+        self.arrays = _Arrays(self)
+
+    @staticmethod
+    def _empty(dtype, n):
+        if np.dtype(dtype).kind == 'f':
+            return np.full(n, np.nan, dtype=dtype)
+        if np.dtype(dtype).kind == 'O':
+            return np.full(n, None, dtype=object)
+        return np.zeros(n, dtype=dtype)
+
+    def new_row(self):
+        if self.size == self.capacity:
+            for name, a in self.arrays.items():
+                grown = self._empty(a.dtype, self.capacity * 2)
+                grown[:self.size] = a
+                self.arrays[name] = grown
+            self.capacity *= 2
+        self.size += 1
+        return self.size - 1
+
+    def columns(self):
+        return {name: self.arrays[name][:self.size] if name in self.arrays else self._empty(dtype, self.size)
+                for name, dtype in self.dtypes.items()}
+
+
+def _local_name(tag):
+    """'{http://www.topografix.com/GPX/1/1}trkpt' -> 'trkpt'"""
+    return tag.rsplit('}', 1)[-1]
+
+
+GPSBABEL_FORMATS = {'.gpx': 'gpx', '.fit': 'garmin_fit', '.tcx': 'gtrnctr'}
+
+
+def _feed(source, pipe):
+    """Copy a file object to the gpsbabel stdin in chunks, then close it"""
     try:
-        df = pd.concat([df, pd.json_normalize(df['Extensions'])], axis=1)
-    except:
-        # TODO log this
-        pass
+        shutil.copyfileobj(source, pipe, 1 << 16)
+    except (BrokenPipeError, ValueError):
+        pass  # gpsbabel stopped reading, its exit code says why
+    finally:
+        try:
+            pipe.close()
+        except BrokenPipeError:
+            pass
+
+
+def _gpsbabel(source, file_ext, timeout=None):
+    """
+    Run gpsbabel with the unicsv output on stdout and parse it while it is written, there are no temporary files.
+    source: a path, given to gpsbabel as is, or a file object that is streamed to gpsbabel on stdin.
+    The errors are classified, GPSBabelNotFoundException: gpsbabel is not installed,
+    GPSBabelTimeoutException: it ran longer then timeout seconds, GPSBabelInputException: it exited with an error
+    or found no points. Messages on stderr with a 0 exit code are warnings, they are logged.
+    """
     try:
-        df_temp = pd.json_normalize(df['HeartRateBpm'])
-        df_temp.rename(columns=col.tcx_heartate, inplace=True)
-        df = pd.concat([df, df_temp], axis=1)
-    except:
-        # TODO log this
-        pass
-    df.rename(columns=col.txc_names, inplace=True)
-    df["Altitude"] = pd.to_numeric(df["Altitude"], downcast="float")
-    df["Latitude"] = pd.to_numeric(df["Latitude"], downcast="float")
-    df["Longitude"] = pd.to_numeric(df["Longitude"], downcast="float")
-    df["Date_Time"] = pd.to_datetime(df["Date_Time"])
-    return df
+        fmt = GPSBABEL_FORMATS[file_ext]
+    except KeyError:
+        raise GPSBabelInputException(f"gpsbabel can not read {file_ext} files, use one of {list(GPSBABEL_FORMATS)}")
+    is_path = isinstance(source, (str, os.PathLike))
+    cmd = ['gpsbabel', '-t', '-i', fmt, '-f', os.fspath(source) if is_path else '-', '-o', 'unicsv', '-F', '-']
+    try:
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL if is_path else subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError as e:
+        raise GPSBabelNotFoundException(f"gpsbabel is not installed or not on the PATH: {e}") from e
+    # stdin and stderr are handled in threads so no pipe fills up while the csv is read from stdout
+    threads = []
+    if not is_path:
+        threads.append(threading.Thread(target=_feed, args=(source, process.stdin), daemon=True))
+    stderr = []
+    threads.append(threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True))
+    timed_out = threading.Event()
 
+    def kill():
+        timed_out.set()
+        process.kill()
 
-def gpx(gpxfile):
+    timer = threading.Timer(timeout, kill) if timeout else None
+    for t in threads + ([timer] if timer else []):
+        t.start()
+    try:
+        with metrics.stage('readers.gpsbabel.subprocess', bytes=metrics._size(source)) as s:
+            parse_error = None
+            try:
+                df = pd.read_csv(process.stdout)
+            except pd.errors.EmptyDataError:
+                df = None
+            except (pd.errors.ParserError, ValueError, UnicodeDecodeError) as e:
+                # A kill on timeout can cut the csv off anywhere
+                df = None
+                parse_error = e
+            finally:
+                process.stdout.close()
+                returncode = process.wait()
+            s.points = None if df is None else len(df)
+    finally:
+        if timer:
+            timer.cancel()
+        for t in threads:
+            t.join()
+    message = b''.join(stderr).decode(errors='replace').strip()
+    if timed_out.is_set() and returncode != 0:
+        raise GPSBabelTimeoutException(f"gpsbabel took more then {timeout} seconds: {message}")
+    if returncode != 0:
+        raise GPSBabelInputException(f"gpsbabel exit code {returncode}: {message}")
+    if timed_out.is_set() and parse_error is not None:
+        raise GPSBabelTimeoutException(f"gpsbabel took more then {timeout} seconds, the output was cut off: "
+                                       f"{parse_error}") from parse_error
+    if parse_error is not None:
+        raise GPSBabelInputException(f"gpsbabel output could not be read: {parse_error}") from parse_error
+    if message:
+        _log.warning(f"gpsbabel: {message}")
+    if df is None or len(df) == 0:
+        raise GPSBabelInputException(f"gpsbabel found no track points. {message}")
+    return _unicsv_frame(df)
+
+
+def _unicsv_frame(df):
+    """
+    The gpsbabel unicsv columns to the gpsfun names and schema, Date and Time are combined into Date_Time.
+    A point with no date or time is NaT, like the native readers.
     """
-    Not sure how laps are saved
+    if {'Date', 'Time'}.issubset(df.columns):
+        date, time = df.pop('Date'), df.pop('Time')
+        stamp = (date.astype(str) + ' ' + time.astype(str)).where(date.notna() & time.notna())
+        df.insert(0, 'Date_Time', pd.to_datetime(stamp, errors='coerce'))
+    return compact(df.rename(columns=col.gpsbabel_names))
+
+
+@metrics.timed('readers.gpsbabel')
+@_cacheable
+def gpsbabel(in_file, file_ext=None, timeout=None):
     """
-    with open(gpxfile, 'rb') as g:
-        gpx = xmltodict.parse(g)
-    df = pd.DataFrame(gpx['gpx']['trk']['trkseg']['trkpt'])
+    gpsbabel -t -i garmin_fit -f {fit_file} -o unicsv -F -
+    gpsbabel -t -i gpx -f {gpx_file} -o unicsv -F -
+    gpsbabel -t -i gtrnctr -f {tcx_file} -o unicsv -F -
+    in_file: path or file object. Paths are read by gpsbabel, file objects, and .gz and .zip files, are streamed to it
+        on stdin (-f -). The csv is parsed from stdout while gpsbabel writes it.
+    timeout: seconds gpsbabel may run, None is no limit
+    See _gpsbabel for the errors.
+    """
+    if isinstance(in_file, (str, os.PathLike)):
+        in_file = os.fspath(in_file)
+        suffixes = [s.lower() for s in Path(in_file).suffixes]
+        file_ext = file_ext or suffixes[-1]
+        if file_ext == '.gz':
+            with gzip.open(in_file, 'rb') as f_in:
+                return _gpsbabel(f_in, suffixes[-2], timeout=timeout)
+        if file_ext == '.zip':
+            with ZipFile(in_file) as myz:
+                for name in myz.namelist():
+                    if Path(name).suffix.lower() in GPSBABEL_FORMATS:
+                        with myz.open(name) as zfile:
+                            return _gpsbabel(zfile, Path(name).suffix.lower(), timeout=timeout)
+            raise GPSFunException(f"No gpx, tcx or fit file in {in_file}")
+        return _gpsbabel(in_file, file_ext, timeout=timeout)
+    # A file object, it is left where it was so it can be read again
+    file_ext = file_ext or Path(in_file.name).suffixes[-1].lower()
+    position = in_file.tell() if in_file.seekable() else None
     try:
-        df = pd.concat([df, pd.json_normalize(df['extensions'])], axis=1)
-        df.rename(columns=col.gpx_extentions, inplace=True)
-    except:
-        # TODO log this
-        pass
-    df.rename(columns=col.gpx_names, inplace=True)
-    df["Altitude"] = pd.to_numeric(df["Altitude"], downcast="float")
-    df["Latitude"] = pd.to_numeric(df["Latitude"], downcast="float")
-    df["Longitude"] = pd.to_numeric(df["Longitude"], downcast="float")
-    df["Date_Time"] = pd.to_datetime(df["Date_Time"])
-    return df
+        return _gpsbabel(in_file, file_ext, timeout=timeout)
+    finally:
+        if position is not None:
+            in_file.seek(position)
 
 
-def fit(file):
+class GPSBabelPool(object):
     """
-    https://github.com/polyvertex/fitdecode
+    A bounded pool of gpsbabel processes for batch work, at most max_workers run at once.
+    gpsbabel does the work in its own process, so threads are enough to keep max_workers of them busy.
+
+        with GPSBabelPool(8) as pool:
+            for path, df in zip(paths, pool.map(paths)):
+                ...
     """
 
-    ######
-    # incomplete and misc
-    ######
+    def __init__(self, max_workers=None, timeout=None, cache=None):
+        """
+        max_workers: default os.cpu_count()
+        timeout: seconds each gpsbabel run may take
+        cache: cache.ParseCache for the results
+        """
+        self.timeout = timeout
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                            thread_name_prefix='gpsbabel')
+
+    def submit(self, in_file, file_ext=None):
+        """:return: a Future of the DataFrame"""
+        return self._executor.submit(gpsbabel, in_file, file_ext, timeout=self.timeout, cache=self.cache)
 
-    def get_fit_session(fit_json):
+    def map(self, files, return_exceptions=False):
         """
-        Get activity sessions from fit_json. We are assuming there is 1.
-        If there is more then one, we should log an error and use only the first.
+        Read all the files, the results are in the same order.
+        return_exceptions: give the exception in place of the DataFrame for the files that fail, instead of raising
         """
-        # activity_sessions = []
-        # activity_session = None
-        # for obj in data:
-        #     if obj['frame_type'] == 'data_message' and obj['name'] == 'session':
-        #         activity_sessions.append(obj)
-        # if len(activity_sessions) == 1:
-        #     activity_session = activity_sessions[0]
-        # elif len(activity_sessions) < 1:
-        #     # log no session found
-        #     pass
-        # elif len(activity_sessions) > 1:
-        #     # TODO log more then one session found. We still choose the first
-        #     activity_session = activity_sessions[0]
-        #
-        # # lets make the list of field easier to use.
-        # activity_summary = dict()
-        # for f in activity_session['fields']:
-        #     activity_summary[f['name']] = {k: v for k, v in f.items() if k != 'name'}
-        # return activity_summary
+        futures = [self.submit(f) for f in files]
+        for future in futures:
+            if return_exceptions:
+                error = future.exception()
+                yield error if error is not None else future.result()
+            else:
+                yield future.result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@metrics.timed('readers.tcx')
+@_cacheable
+def tcx(tcxfile, laps=False):
+    """
+    Streaming tcx reader, the Trackpoint values are written directly into numpy arrays.
+    tcxfile: path or file object
+    laps: if True return (df, laps_df). laps_df has one row per Lap with the StartTime and the lap summary values,
+    see col.tcx_lap_numeric and col.tcx_lap_text.
+    The "lap" column in df is the lap number of each Trackpoint.
+    """
+    float_columns = ['Altitude', 'Distance', 'HeartRate', 'Cadence', 'Speed', 'Power']
+    dtypes = {'Latitude': np.float64, 'Longitude': np.float64, 'Date_Time': object}
+    dtypes.update({c: np.float64 for c in float_columns})
+    dtypes['lap'] = np.int32
+    cols = _Columns(dtypes)
+    lap_rows = []
+    names = {}  # tag -> local name
+
+    def name_of(e):
+        return names.get(e.tag) or names.setdefault(e.tag, _local_name(e.tag))
+
+    def set_float(a, column, row, text):
+        try:
+            a[column][row] = float(text)
+        except (TypeError, ValueError):
+            pass  # Leave it nan
+
+    lap_start = 0
+    parent = None  # the Track being read, the points are removed from it when they are done
+    for event, elem in ElementTree.iterparse(tcxfile, events=('start', 'end')):
+        tag = name_of(elem)
+        if event == 'start':
+            if tag == 'Track':
+                parent = elem
+            continue
+        if tag == 'Track':
+            parent = None
+        elif tag == 'Trackpoint':
+            row = cols.new_row()
+            a = cols.arrays
+            for child in elem:
+                name = name_of(child)
+                if name == 'Time':
+                    a['Date_Time'][row] = child.text.strip()
+                elif name == 'Position':
+                    for p in child:
+                        set_float(a, col.txc_names.get(name_of(p)), row, p.text)
+                elif name == 'HeartRateBpm':
+                    for v in child:
+                        set_float(a, col.tcx_heartate.get(name_of(v)), row, v.text)
+                elif name == 'Extensions':
+                    for e in child.iter():
+                        if name_of(e) in col.txc_extentions:
+                            set_float(a, col.txc_extentions[name_of(e)], row, e.text)
+                elif name in col.txc_names:
+                    set_float(a, col.txc_names[name], row, child.text)
+            # Like gpx, the point is removed so a long lap is not held in memory
+            elem.clear()
+            if parent is not None:
+                parent.remove(elem)
+        elif tag == 'Lap':
+            cols.arrays['lap'][lap_start:cols.size] = len(lap_rows)
+            lap_start = cols.size
+            summary = {'lap': len(lap_rows), 'StartTime': elem.get('StartTime')}
+            summary.update({n: np.nan for n in col.tcx_lap_numeric})
+            summary.update({n: None for n in col.tcx_lap_text})
+            for child in elem:
+                name = name_of(child)
+                if name in ('AverageHeartRateBpm', 'MaximumHeartRateBpm') and len(child):
+                    summary[name] = float(child[0].text)
+                elif name in col.tcx_lap_numeric and child.text and child.text.strip():
+                    summary[name] = float(child.text)
+                elif name in col.tcx_lap_text:
+                    summary[name] = child.text
+                elif name == 'Extensions':
+                    for e in child.iter():
+                        if name_of(e) in col.tcx_lap_numeric and e.text and e.text.strip():
+                            summary[name_of(e)] = float(e.text)
+            lap_rows.append(summary)
+            elem.clear()
+
+    data = cols.columns()
+    # Only keep the optional columns that are in the file
+    for c in float_columns:
+        if np.isnan(data[c]).all():
+            del data[c]
+    df = compact(pd.DataFrame(data))
+    if not laps:
+        return df
+    laps_df = pd.DataFrame(lap_rows, columns=['lap', 'StartTime'] + col.tcx_lap_numeric + col.tcx_lap_text)
+    laps_df['StartTime'] = pd.to_datetime(laps_df['StartTime'])
+    return df, laps_df
+
+
+@metrics.timed('readers.gpx')
+@_cacheable
+def gpx(gpxfile):
+    """
+    Streaming gpx reader, the trkpt values are written directly into numpy arrays.
+    gpxfile: path or file object
+    Every trk and trkseg is read. If there is more then one trkseg, the "lap" column is the trkseg number.
+    The extension fields in col.gpx_extentions are read by local name, so any namespace prefix works.
+    """
+    float_columns = list(col.gpx_extentions.values())
+    dtypes = {'Latitude': np.float64, 'Longitude': np.float64, 'Altitude': np.float64, 'Date_Time': object}
+    dtypes.update({c: np.float64 for c in float_columns})
+    dtypes['lap'] = np.int32
+    cols = _Columns(dtypes)
+    names = {}  # tag -> local name
+    segment = 0
+    segment_start = 0
+    parent = None  # the trkseg being read, the points are removed from it when they are done
+    for event, elem in ElementTree.iterparse(gpxfile, events=('start', 'end')):
+        tag = names.get(elem.tag) or names.setdefault(elem.tag, _local_name(elem.tag))
+        if event == 'start':
+            if tag == 'trkseg':
+                parent = elem
+            continue
+        if tag == 'trkseg':
+            parent = None
+            if cols.size > segment_start:
+                cols.arrays['lap'][segment_start:cols.size] = segment
+                segment += 1
+                segment_start = cols.size
+            elem.clear()
+        elif tag == 'trkpt':
+            row = cols.new_row()
+            a = cols.arrays
+            a['Latitude'][row] = float(elem.get('lat'))
+            a['Longitude'][row] = float(elem.get('lon'))
+            for child in elem.iter():
+                if child.text is None:
+                    continue
+                name = names.get(child.tag) or names.setdefault(child.tag, _local_name(child.tag))
+                if name == 'time':
+                    a['Date_Time'][row] = child.text.strip()
+                elif name == 'ele' or name in col.gpx_extentions:
+                    try:
+                        a[col.gpx_names.get(name) or col.gpx_extentions[name]][row] = float(child.text)
+                    except ValueError:
+                        pass  # Leave it nan
+            # The point is done, it is removed so the document is never held in memory. It is the only child
+            # of parent left, so the remove is quick.
+            elem.clear()
+            if parent is not None:
+                parent.remove(elem)
+
+    data = cols.columns()
+    # Only keep the optional columns that are in the file
+    for c in ['Altitude'] + float_columns:
+        if np.isnan(data[c]).all():
+            del data[c]
+    if segment < 2:
+        del data['lap']
+    return compact(pd.DataFrame(data))
+
+
+def _fit_message(frame):
+    """
+    A lap or session message as a dict, the unknown fields are skipped and positions are converted to degrees.
+    """
+    message = {}
+    for field in frame.fields:
+        if field.name.startswith('unknown_'):
+            continue
+        value = field.value
+        if field.units == 'semicircles' and value is not None:
+            value = value * SEMICIRCLES_TO_DEGREES
+        message[field.name] = value
+    return message
+
+
+def _read_fit(file):
+    """
+    Read the record, lap and session messages from a fit file in one pass.
+    The record fields in col.fit_names are written directly into numpy arrays.
+    """
+    import fitdecode  # only load it when a fit file is read
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        file = io.BytesIO(file)
+    # The timestamp is a float so a record without one is nan, and NaT in the DataFrame
+    dtypes = {'Latitude': np.float64, 'Longitude': np.float64, 'Altitude': np.float64, 'Date_Time': np.float64}
+    float_columns = ['Altitude', 'Distance', 'Speed', 'HeartRate', 'Cadence', 'Power', 'Temp']
+    dtypes.update({c: np.float64 for c in float_columns})
+    dtypes['lap'] = np.int32
+    # semicircles and the timestamp are kept raw, they are converted on the whole array
+    raw_columns = {'Latitude', 'Longitude', 'Date_Time'}
+    cols = _Columns(dtypes)
+    laps = []
+    sessions = []
+    with fitdecode.FitReader(file) as fit_file:
+        for frame in fit_file:
+            if frame.frame_type != fitdecode.FIT_FRAME_DATA:
+                continue
+            if frame.name == 'record':
+                row = cols.new_row()
+                a = cols.arrays
+                a['lap'][row] = len(laps)
+                for field in frame.fields:
+                    column = col.fit_names.get(field.name)
+                    if column is None or field.raw_value is None:
+                        continue
+                    if column in raw_columns:
+                        a[column][row] = field.raw_value
+                    elif field.name[:9] == 'enhanced_' or np.isnan(a[column][row]):
+                        a[column][row] = field.value
+            elif frame.name == 'lap':
+                laps.append(_fit_message(frame))
+            elif frame.name == 'session':
+                sessions.append(_fit_message(frame))
+
+    data = cols.columns()
+    for c in float_columns:
+        if np.isnan(data[c]).all():
+            del data[c]
+    # Records after the last lap message belong to the last lap
+    np.clip(data['lap'], None, max(len(laps) - 1, 0), out=data['lap'])
+    data['Latitude'] = data['Latitude'] * SEMICIRCLES_TO_DEGREES
+    data['Longitude'] = data['Longitude'] * SEMICIRCLES_TO_DEGREES
+    has_time = ~np.isnan(data['Date_Time'])
+    seconds = np.where(has_time, data['Date_Time'], 0).astype(np.int64)
+    data['Date_Time'] = (FIT_EPOCH + pd.to_timedelta(seconds, unit='s')).where(has_time)
+    return compact(pd.DataFrame(data)), laps, sessions
+
+
+@metrics.timed('readers.fit')
+@_cacheable
+def fit(file, laps=False, session=False):
+    """
+    Read a fit file without gpsbabel, using https://github.com/polyvertex/fitdecode
+    file: path, file object or bytes, nothing is written to disk.
+    The "lap" column is the lap number of each record.
+    laps: also return a laps DataFrame, one row per lap message.
+    session: also return the activity session, see fit_session.
+    :return: df, or a tuple (df, laps_df, session) with only the items asked for.
+    """
+    df, lap_messages, sessions = _read_fit(file)
+    if not laps and not session:
+        return df
+    result = [df]
+    if laps:
+        result.append(pd.DataFrame(lap_messages))
+    if session:
+        result.append(_first_session(sessions))
+    return tuple(result)
+
+
+def _first_session(sessions):
+    """
+    We are assuming there is 1 session.
+    If there is more then one, log an error and use only the first.
+    """
+    if len(sessions) < 1:
+        _log.error("No session found in fit file")
+        return None
+    if len(sessions) > 1:
+        _log.error(f"{len(sessions)} sessions found in fit file, using the first")
+    return sessions[0]
+
+
+def fit_session(file):
+    """
+    Get the activity session from a fit file as a dict of field name: value
+    """
+    return _first_session(_read_fit(file)[2])
+
+
+@metrics.timed('readers.read')
+@_cacheable
+def read(in_file, file_ext=None):
+    """
+    Read a gpx, tcx or fit file with the native readers, gpsbabel is not used.
+    in_file: path or file object. For a file object without a name give the file_ext, '.gpx', '.tcx' or '.fit'
+    .gz and .zip files are decompressed in memory, for a zip the first gpx, tcx or fit file is read.
+    """
+    readers = {'.gpx': gpx, '.tcx': tcx, '.fit': fit}
+    if isinstance(in_file, (str, os.PathLike)):
+        in_file = os.fspath(in_file)
+        suffixes = [s.lower() for s in Path(in_file).suffixes]
+        file_ext = file_ext or suffixes[-1]
+        if file_ext == '.gz':
+            with gzip.open(in_file, 'rb') as f_in:
+                return readers[suffixes[-2]](f_in)
+        if file_ext == '.zip':
+            with ZipFile(in_file) as myz:
+                for name in myz.namelist():
+                    if Path(name).suffix.lower() in readers:
+                        with myz.open(name) as zfile:
+                            return readers[Path(name).suffix.lower()](zfile)
+            raise GPSFunException(f"No gpx, tcx or fit file in {in_file}")
+    else:
+        file_ext = file_ext or Path(in_file.name).suffix.lower()
+    try:
+        reader = readers[file_ext]
+    except KeyError:
+        raise GPSFunException(f"Unknown file type: {file_ext}")
+    return reader(in_file)
@@ -2,46 +2,81 @@ from datetime import timedelta
 import pandas as pd
 import numpy as np
 
-from exceptions import MatchCheckpointsException
+try:
+    from .exceptions import MatchCheckpointsException, CalcResultsException
+    from .gpsfun import increase_points
+except:
+    from exceptions import MatchCheckpointsException, CalcResultsException
+    from gpsfun import increase_points
 
 
-def find_acute(df, i, segment, near, epsilon):
+def point_tree(latitude, longitude):
     """
-    1. Calculate the distance from the chekpoint to all consecutive points in the data.
-    2. Acute, For ck "i" if the angle between the lines ck:A and A:B acute. If so then ck is "between" A and B
-            Epislon is the fudge factor
+    KD-tree of the activity points, distances are in degrees like the rest of the checkpoint matching.
+    Points without a position are left out.
+    :return: (tree, row positions of the points in the tree)
     """
-    point = (segment['location']['lat'], segment['location']['lon'])
-    df[f'ck_to_A{i}'] = np.linalg.norm(df[['Latitude', 'Longitude']].values - point, axis=1)
-    df[f'ck_to_B{i}'] = np.linalg.norm(df[['shift_Latitude', 'shift_Longitude']].values - point,
-                                       axis=1)
-    if df[f'ck_to_A{i}'].min() > near * 10:
-        raise MatchCheckpointsException(
-            f"It appears you never made it close to checkpoint {segment['segment_name']}")
-    df['acute'] = df[f'ck_to_A{i}'] ** 2 + df['dist_to_next'] ** 2 <= df[
-        f'ck_to_B{i}'] ** 2 + epsilon
+    points = np.column_stack([np.asarray(latitude, dtype=np.float64), np.asarray(longitude, dtype=np.float64)])
+    rows = np.flatnonzero(np.isfinite(points).all(axis=1))
+    from scipy.spatial import cKDTree  # scipy is slow to import, only load it when it is used
+    return cKDTree(points[rows]), rows
 
 
-def match_checkpoints(df, epsilon, near, segments):
+def checkpoint_points(segments):
+    """
+    :return: (n, 2) float64 array of the [lat, lon] of each segment location
+    """
+    return np.array([[s['location']['lat'], s['location']['lon']] for s in segments], dtype=np.float64).reshape(-1, 2)
+
+
+def find_checkpoints(latitude, longitude, segments, near, epsilon, tree=None, checkpoints=None):
     """
-    Identify the activity point the represents the arrival at the checkpoint
-    find near points that form acute triangles
+    Identify the activity point the represents the arrival at each checkpoint.
+    For checkpoint i, the match is the first point A, at or after the match for checkpoint i - 1, that is within near
+    of the checkpoint and where the angle between ck:A and A:B is acute, B being the next point. So the checkpoint is
+    "between" A and B, epsilon is the fudge factor.
+    Only the points within near of the checkpoint are looked at, they are found with a KD-tree, all the checkpoints
+    in one query.
+    tree: (tree, rows) from point_tree, if it has already been made.
+    checkpoints: checkpoint_points(segments), if it has already been made.
+    :return: list of row positions, one per segment
     """
+    points = np.column_stack([np.asarray(latitude, dtype=np.float64), np.asarray(longitude, dtype=np.float64)])
+    tree, rows = tree or point_tree(latitude, longitude)
+    if checkpoints is None:
+        checkpoints = checkpoint_points(segments)
+    closest, _ = tree.query(checkpoints)
+    near_points = tree.query_ball_point(checkpoints, r=near)
+    matches = []
     row_slice = 0
     for i, seg in enumerate(segments):
-        try:
-            find_acute(df, i, seg, near, epsilon)
-            # assign segment number to first acute point near the point seg point)
-            df.loc[
-                df[row_slice:][(df[row_slice:][f'ck_to_A{i}'] <= near) &
-                               (df[row_slice:].acute)].index[0], ['checkpoint', 'Segment_name']] = i, seg[
-                'Segment_name']
-            # This removes the points we have past.
-            row_slice = int(df[df.checkpoint == i].index[0])
-            # df['seg_duration'] = df[df.checkpoint >= 0]['Date_Time'].diff()
-        except Exception as e:
+        point = checkpoints[i]
+        if closest[i] > near * 10:
             raise MatchCheckpointsException(
-                f"Fail on checkpoint:{i} location: {(seg['location']['lat'], seg['location']['lon'])}\nDataframe columns:\n{df.columns}")
+                f"It appears you never made it close to checkpoint {i}: {seg.get('Segment_name')}")
+        candidates = np.sort(rows[np.asarray(near_points[i], dtype=np.intp)])
+        # This removes the points we have past, the last point has no next point
+        candidates = candidates[(candidates >= row_slice) & (candidates < len(points) - 1)]
+        ck_to_a = np.linalg.norm(points[candidates] - point, axis=1)
+        ck_to_b = np.linalg.norm(points[candidates + 1] - point, axis=1)
+        to_next = np.linalg.norm(points[candidates] - points[candidates + 1], axis=1)
+        acute = ck_to_a ** 2 + to_next ** 2 <= ck_to_b ** 2 + epsilon
+        if not acute.any():
+            raise MatchCheckpointsException(
+                f"Fail on checkpoint:{i} location: {(seg['location']['lat'], seg['location']['lon'])}")
+        row_slice = int(candidates[np.argmax(acute)])
+        matches.append(row_slice)
+    return matches
+
+
+def match_checkpoints(df, epsilon, near, segments):
+    """
+    Identify the activity point the represents the arrival at the checkpoint, see find_checkpoints.
+    Sets the checkpoint and Segment_name columns for the matched points.
+    """
+    matches = find_checkpoints(df['Latitude'].values, df['Longitude'].values, segments, near=near, epsilon=epsilon)
+    for i, row in enumerate(matches):
+        df.loc[df.index[row], ['checkpoint', 'Segment_name']] = i, segments[i]['Segment_name']
 
 
 def calculate_segment_times(df, segments):
@@ -56,61 +91,94 @@ def calculate_segment_times(df, segments):
     # TODO Add segment metrics
 
 
-def calculate_segment_distance(df, segments):
+def tictoc_distances(times, distance, starts, durations):
+    """
+    The distance covered in each tic-toc section, all the sections at once.
+    The end of each section is found with one searchsorted on the times and the distance at the end is interpolated
+    between the points either side of it, (b - a) * ((p - c) / (d - c)) + a with a and b the distance and c and d the
+    time of those points and p the end. An end on a point is the distance of that point.
+    times: datetime64 or int64 ns of each point, in order. NaT takes the time of the point before.
+    distance: cumulative distance of each point
+    starts: row position of the start of each section
+    durations: the length of each section, timedelta64 or pd.Timedelta
+    :return: (distances, end times as int64 ns)
+    """
+    t = np.maximum.accumulate(np.asarray(times).view(np.int64))
+    distance = np.asarray(distance, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.intp)
+    ends = t[starts] + np.asarray(pd.to_timedelta(durations).values).view(np.int64)
+    after = np.searchsorted(t, ends, side='left')  # first point at or past the end
+    if (after >= len(t)).any():
+        raise CalcResultsException(f"The activity stops before the end of tic-toc section "
+                                   f"{int(np.argmax(after >= len(t)))}")
+    before = np.searchsorted(t, ends, side='right') - 1  # last point at or before the end
+    gap = (t[after] - t[before]).astype(np.float64)
+    fraction = np.divide((ends - t[before]).astype(np.float64), gap, out=np.zeros(len(gap)), where=gap > 0)
+    finish = distance[before] + (distance[after] - distance[before]) * fraction
+    return finish - distance[starts], ends
+
+
+def calculate_segment_distance(df, segments, distance=None, checkpoints=None):
     """
-    This is for fixed distance competeing for distance TicToc
+    This is for fixed time competeing for distance TicToc, there can be any number of tic-toc sections.
+    Each tictoc segment is timed from its checkpoint for type_args['tictoc'] minutes.
     [{
     'segment_name': 'Event Start',
     'location': {'lat': 39.737912, 'lon': -105.523881},
-    'type_name': 'transport',
-    'type_args': {'time_limit': 1800}
-    'duration': Timedelta('0 days 00:24:21'),
+    'type_name': 'tictoc',
+    'type_args': {'tictoc': 30}
+    'duration': Timedelta('0 days 00:30:00'),
     'datetime': Timestamp('2012-07-21 09:18:13'),
     'distance': 25677
-    'total_timed': datetime.timedelta(0),
-     total_timed_types: {'uphill':Timedelta(123), 'gravel': Timedelta(321)}
+    'total_distance': 25677, the tic-toc distance so far
      },]
+    distance: cumulative distance of each point, the df distance column is used if it is not given.
+    checkpoints: row position of the point matched to each segment, see find_checkpoints. The df checkpoint column
+        is used if it is not given.
+    segments are not changed, the results are copies.
      """
-    results = []
-    for i, seg in enumerate(segments):
-        if seg['type_name'] == 'tictoc':
-            seg_start_time = df[df.checkpoint == i].Date_Time.values[0]
-            seg_end_time = seg_start_time + pd.Timedelta(minutes=seg['type_args']['tictoc'])
-            seg_past_end = df[df.Date_Time >= seg_end_time].iloc[0]
-            seg_before_end = df[df.Date_Time <= seg_end_time].iloc[-1]
-            a = seg_before_end.distance
-            b = seg_past_end.distance
-            c = seg_before_end.Date_Time
-            d = seg_past_end.Date_Time
-            p = seg_end_time
-            seg_finish = (b - a) * ((p - d) / (d - c)) + a
-            seg_distance = seg_finish - df[df.checkpoint == i].distance.iloc[0]
-            seg['distance'] = seg_distance
-            seg['duration'] = timedelta(minutes=seg['type_args']['tictoc'])
-            seg['datetime'] = pd.to_datetime(seg_start_time)
-            results.append(seg)
-        else:
-            results.append(seg)
+    distance = df['distance'].values if distance is None else np.asarray(distance)
+    if checkpoints is None:
+        checkpoint = df['checkpoint'].values
+        checkpoints = [int(np.argmax(checkpoint == i)) if (checkpoint == i).any() else -1 for i in range(len(segments))]
+    sections = [i for i, seg in enumerate(segments) if seg.get('type_name') == 'tictoc']
+    durations = [timedelta(minutes=segments[i]['type_args']['tictoc']) for i in sections]
+    starts = np.array([checkpoints[i] for i in sections], dtype=np.intp)
+    if (starts < 0).any():
+        raise CalcResultsException(f"Tic-toc segment {sections[int(np.argmax(starts < 0))]} was not matched")
+    distances, _ = tictoc_distances(df['Date_Time'].values, distance, starts, durations)
+    start_times = df['Date_Time'].iloc[starts]
+
+    results = [seg.copy() for seg in segments]
+    total_distance = 0.0
+    for r, section in zip(results, np.cumsum([seg.get('type_name') == 'tictoc' for seg in segments]) - 1):
+        if r.get('type_name') == 'tictoc':
+            total_distance += distances[section]
+            r['distance'] = distances[section]
+            r['duration'] = durations[section]
+            r['datetime'] = start_times.iloc[section]
+        r['total_distance'] = total_distance
     return results
 
 
-def select_near_points(self, check_point, df):
+def select_near_points(check_point, df, near=.0002, freq='250ms'):
     """
-    TODO: Work in progress
-    Selects points near the checkpoints:
-    These may be anywhere in the activity, but that seems ok.
+    The points near a checkpoint with more points added between them, to match the checkpoint more precisely.
+    check_point: {'lat':, 'lon':}
+    near: in degrees like match_checkpoints, the points within near and the point before and after each pass are
+        used.
+    freq: time between the added points, see gpsfun.increase_points
+    :return: DataFrame of the passes near the checkpoint, with the original Date_Time, Latitude, Longitude and
+        Altitude columns
     """
-    df['Date_Time'] = df.Date_Time.astype(np.int64)
-    columns = ['Date_Time', 'Latitude', 'Longitude', 'Altitude']
-    start = 10
-    end = 11
-    rows = 7  # actually get rows - 2
-    realend = (end - start) * 5 + start
-    for i in range(start, realend, rows):
-        curr_row = df[columns].iloc[i]
-        next_row = df[columns].iloc[i + 1]
-        new_df = pd.DataFrame(np.linspace(curr_row, next_row, rows), columns=columns)
-        df = pd.concat([df[:i], new_df, df[i + rows:]], ignore_index=True)
-
-    df['Date_Time'] = df.Date_Time.astype('datetime64[ns]')
-    print(df[9:25].head(25))
+    tree, rows = point_tree(df['Latitude'].values, df['Longitude'].values)
+    close = np.sort(rows[tree.query_ball_point([check_point['lat'], check_point['lon']], r=near)])
+    if len(close) == 0:
+        return df.iloc[:0]
+    # Each run of consecutive rows is one pass
+    breaks = np.flatnonzero(np.diff(close) > 1) + 1
+    passes = []
+    for run in np.split(close, breaks):
+        start, end = max(run[0] - 1, 0), min(run[-1] + 2, len(df))
+        passes.append(increase_points(df, freq=freq, slice=(start, end)))
+    return pd.concat(passes, ignore_index=True)
@@ -0,0 +1,120 @@
+"""
+Track simplification, fewer points with the same shape, for storage and maps.
+
+rdp: Ramer-Douglas-Peucker, keeps the point furthest from the line between the points kept so far until every
+    point is within tolerance meters. Uses a stack instead of recursion, each segment is one numpy step.
+visvalingam: Visvalingam-Whyatt, removes the point that makes the smallest triangle with its neighbours until
+    every triangle is at least tolerance ** 2 / 2 square meters, the area of a right triangle with both short
+    sides tolerance. Uses a heap.
+
+The points are projected to meters on a plane around the middle of the track, good for anything smaller then
+a country. Points without a position are dropped.
+
+    small = simplify(df, tolerance=5)
+"""
+import heapq
+import numpy as np
+try:
+    from .geodesic import EARTH_RADIUS
+except:
+    from geodesic import EARTH_RADIUS
+
+
+def _project(latitude, longitude):
+    """Equirectangular x, y in meters"""
+    latitude = np.radians(np.asarray(latitude, dtype=np.float64))
+    longitude = np.radians(np.asarray(longitude, dtype=np.float64))
+    lat0 = np.nanmean(latitude) if len(latitude) else 0.0
+    return EARTH_RADIUS * longitude * np.cos(lat0), EARTH_RADIUS * latitude
+
+
+def rdp(latitude, longitude, tolerance):
+    """
+    :return: bool array, True for the points to keep
+    """
+    x, y = _project(latitude, longitude)
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[[0, n - 1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        px, py = x[first + 1:last], y[first + 1:last]
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        length2 = dx * dx + dy * dy
+        # Distance to the segment, not the infinite line, so a track that turns back is kept
+        if length2 > 0:
+            t = np.clip(((px - x[first]) * dx + (py - y[first]) * dy) / length2, 0, 1)
+        else:
+            t = 0.0
+        d2 = (px - x[first] - t * dx) ** 2 + (py - y[first] - t * dy) ** 2
+        i = int(np.argmax(d2))
+        if d2[i] > tolerance * tolerance:
+            i += first + 1
+            keep[i] = True
+            stack.append((first, i))
+            stack.append((i, last))
+    return keep
+
+
+def visvalingam(latitude, longitude, tolerance):
+    """
+    :return: bool array, True for the points to keep
+    """
+    x, y = _project(latitude, longitude)
+    n = len(x)
+    keep = np.ones(n, dtype=bool)
+    if n < 3:
+        return keep
+    min_area = tolerance * tolerance / 2
+    previous = np.arange(-1, n - 1)
+    following = np.arange(1, n + 1)
+    # All the starting areas at once
+    area = np.full(n, np.inf)
+    area[1:-1] = np.abs((x[:-2] - x[2:]) * (y[1:-1] - y[:-2]) - (x[:-2] - x[1:-1]) * (y[2:] - y[:-2])) / 2
+    heap = [(a, i) for i, a in enumerate(area[1:-1], 1)]
+    heapq.heapify(heap)
+
+    def triangle(i):
+        a, b = previous[i], following[i]
+        return abs((x[a] - x[b]) * (y[i] - y[a]) - (x[a] - x[i]) * (y[b] - y[a])) / 2
+
+    while heap:
+        a, i = heapq.heappop(heap)
+        if not keep[i] or a != area[i]:
+            continue  # removed, or its area changed and it was pushed again
+        if a >= min_area:
+            break
+        keep[i] = False
+        p, f = previous[i], following[i]
+        following[p] = f
+        previous[f] = p
+        for j in (p, f):
+            if 0 < j < n - 1:
+                # A neighbour never gets a smaller area then the point removed next to it
+                area[j] = max(triangle(j), a)
+                heapq.heappush(heap, (area[j], j))
+    return keep
+
+
+METHODS = {'rdp': rdp,
+           'visvalingam': visvalingam}
+
+
+def simplify(df, tolerance, method='rdp'):
+    """
+    df: DataFrame with Latitude and Longitude
+    tolerance: in meters
+    method: one of METHODS
+    :return: the rows of df to keep, points without a position are dropped
+    """
+    try:
+        func = METHODS[method]
+    except KeyError:
+        raise ValueError(f"Unknown simplify method: {method}, use one of {list(METHODS)}")
+    df = df[df['Latitude'].notna() & df['Longitude'].notna()]
+    return df[func(df['Latitude'].values, df['Longitude'].values, tolerance)]
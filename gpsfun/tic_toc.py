@@ -1,10 +1,13 @@
-import numpy as np
-from segments import match_checkpoints, calculate_segment_distance
-
 try:
     from .exceptions import RallyStyleException, RallyResultsException, MatchCheckpointsException, CalcResultsException
+    from .segments import find_checkpoints, calculate_segment_distance
+    from .tracks import Track
+    from . import metrics
 except:
     from exceptions import RallyStyleException, RallyResultsException, MatchCheckpointsException, CalcResultsException
+    from segments import find_checkpoints, calculate_segment_distance
+    from tracks import Track
+    import metrics
 
 
 class TicTocResults(object):
@@ -35,6 +38,7 @@ class TicTocResults(object):
         'total_timed': datetime.timedelta(0),
         total_timed_types: {'uphill':Timedelta(123), 'gravel': Timedelta(321)}
         distance: {23400} # the distance traveled in  time, this is what the results are based on.
+        total_distance: {23400} # the tic-toc distance so far, every segment has it
       },]
         """
 
@@ -50,17 +54,30 @@ class TicTocResults(object):
         self.results = []
         # self.ck_points = pd.DataFrame([p['location'] for p in segments], columns=['Latitude', 'Longitude'])
         self.ck_points = [p['location'] for p in segments]
-        if 'shift_Longitude' not in self.df.columns:
-            self.df['shift_Longitude'] = self.df.shift(-1)['Longitude']
-        if 'shift_Latitude' not in self.df.columns:
-            self.df['shift_Latitude'] = self.df.shift(-1)['Latitude']
-        if 'dist_to_next' not in self.df.columns:
-            self.df['dist_to_next'] = np.linalg.norm(self.df[['Latitude', 'Longitude']].values -
-                                                     self.df[['shift_Latitude', 'shift_Longitude']].values, axis=1)
+        self.checkpoints = None  # row position of the activity point matched to each checkpoint
+
+    @metrics.timed('tictoc.match_checkpoints')
+    def match_checkpoints(self):
+        """
+        Identify the activity point the represents the arrival at each checkpoint, see segments.find_checkpoints
+        self.df is not changed.
+        :return: list of row positions, one per checkpoint
+        """
+        self.checkpoints = find_checkpoints(self.df['Latitude'].values, self.df['Longitude'].values, self.segments,
+                                            near=self.near, epsilon=self.epsilon)
+        return self.checkpoints
 
+    @metrics.timed('tictoc.calc_results')
     def calc_results(self):
         """
-        We are assuming only 1 tictoc section. We have a start point that triggers the timer.
+        Every tictoc segment is a section, its timer starts at the checkpoint. There can be any number of them.
         """
-        match_checkpoints(df=self.df, epsilon=self.epsilon, near=self.near, segments=self.segments)
-        self.results = calculate_segment_distance(self.df, self.segments)
+        if self.checkpoints is None:
+            self.match_checkpoints()
+        if 'distance' in self.df.columns:
+            distance = self.df['distance'].values
+        else:
+            distance = Track(self.df).cumulative_distance.values
+        self.results = calculate_segment_distance(self.df, self.segments, distance=distance,
+                                                  checkpoints=self.checkpoints)
+        return self.results
@@ -1,24 +1,75 @@
-from math import sqrt
+import logging
+import numpy as np
 import pandas as pd
-from haversine import haversine, Unit
-import requests
+try:
+    from . import geodesic, elevation, moving, export, metrics
+    from .simplify import simplify as simplify_track
+    from .exceptions import GeocodeException
+except:
+    import geodesic
+    import elevation
+    import moving
+    import export
+    import metrics
+    from simplify import simplify as simplify_track
+    from exceptions import GeocodeException
+
+_log = logging.getLogger(__name__)
+
+
+class cached(object):
+    """
+    A Track property that is calculated once and kept in track._cache until something it depends on changes.
+    depends: the df columns, Track settings and other cached properties the value is calculated from.
+    Each calculation is a metrics stage, track.<name>.
+    """
+
+    def __init__(self, *depends):
+        self.depends = set(depends)
+
+    def __call__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+        self.stage = f"track.{self.name}"
+        return self
+
+    def __get__(self, track, owner):
+        if track is None:
+            return self
+        try:
+            return track._cache[self.name]
+        except KeyError:
+            with metrics.stage(self.stage) as s:
+                s.points = len(track.df)
+                value = track._cache[self.name] = self.func(track)
+            return value
 
 
 class Track(object):
     """
     Assumes WGS84 coordinate system
+    The statistics are calculated from the df columns, df is never changed. The per point values,
+    altitude_change, time_between, distance_between, ... are properties that are calculated when they are first used
+    and then cached, see invalidate.
     Altitude:
-    look at this for altitude: https://github.com/tkrajina/srtm.py
+    Use elevation.fill_altitude to add or correct it from SRTM tiles.
     """
 
     def __init__(self, df):
+        self._cache = {}
+        self._distance_method = 'haversine'
+        self._min_movement = 0.05
+        self._moving_method = {'method': 'simple'}
+        self._elevation_filter = {'method': 'hysteresis', 'threshold': 5.0}
         self.df = df
-        self.columns = df.columns
         self.min_elevation = None
         self.max_elevation = None
         self.avg_elevation = None
         self.ascent = None
         self.descent = None
+        self.filtered_ascent = None
+        self.filtered_descent = None
         self.start_time = None
         self.end_time = None
         self.elapsed_time = None
@@ -28,40 +79,241 @@ class Track(object):
         self.place_info = None
         self.place_name = None
 
-    def _calc_moving_time(self, method="simple", min_movement=0.05):
+    @property
+    def df(self):
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+        self.columns = df.columns
+        self.invalidate()
+
+    @property
+    def distance_method(self):
+        """The distance model, see geodesic.METHODS"""
+        return self._distance_method
+
+    @distance_method.setter
+    def distance_method(self, method):
+        if method != self._distance_method:
+            self._distance_method = method
+            self.invalidate('distance_method')
+
+    @property
+    def min_movement(self):
+        """Points that moved less then this many meters are not counted in the moving time"""
+        return self._min_movement
+
+    @min_movement.setter
+    def min_movement(self, meters):
+        if meters != self._min_movement:
+            self._min_movement = meters
+            self.invalidate('min_movement')
+
+    @property
+    def moving_method(self):
+        """
+        How the moving time is found, the arguments of moving.moving. 'simple' uses min_movement.
+        {'method': 'simple'}, {'method': 'speed', 'min_speed': 0.5}, {'method': 'pause', 'min_pause': 30},
+        {'method': 'auto_pause', 'pause_speed': 0.9, 'resume_speed': 1.4}
+        """
+        return self._moving_method
+
+    @moving_method.setter
+    def moving_method(self, kwargs):
+        if kwargs != self._moving_method:
+            self._moving_method = dict(kwargs)
+            self.invalidate('moving_method')
+
+    @property
+    def elevation_filter(self):
+        """
+        The altitude filter for filtered_ascent and filtered_descent, the arguments of elevation.filter_altitude.
+        With 'distance': True a moving_average window is in meters.
+        {'method': 'hysteresis', 'threshold': 5.0}, {'method': 'savgol', 'window': 9, 'order': 2},
+        {'method': 'moving_average', 'window': 50, 'distance': True}
+        """
+        return self._elevation_filter
+
+    @elevation_filter.setter
+    def elevation_filter(self, kwargs):
+        if kwargs != self._elevation_filter:
+            self._elevation_filter = dict(kwargs)
+            self.invalidate('elevation_filter')
+
+    def invalidate(self, *names):
+        """
+        Forget the cached values that depend on names, df columns, settings or cached properties.
+        With no names everything is forgotten. Call this after changing df in place, for example
+        track.invalidate('Altitude') after track.df['Altitude'] = ...
+        """
+        if not names:
+            self._cache.clear()
+            return
+        changed = set(names)
+        # The cached properties of the class and every base class, a subclass only has its own in vars()
+        props = [p for klass in type(self).__mro__ for p in vars(klass).values() if isinstance(p, cached)]
+        # Follow the dependencies until nothing new is found
+        while True:
+            dependent = {p.name for p in props if p.depends & changed} - changed
+            if not dependent:
+                break
+            changed |= dependent
+        for name in changed:
+            self._cache.pop(name, None)
+
+    def _series(self, values, name):
+        return pd.Series(values, index=self.df.index, name=name)
+
+    @cached('Altitude')
+    def altitude_change(self):
+        """
+        Altitude difference from the point before, the first value is nan.
+        """
+        altitude = self.df["Altitude"].to_numpy(dtype=np.float64)
+        change = np.full(altitude.shape, np.nan)
+        change[1:] = np.diff(altitude)
+        return self._series(change, 'altitude_change')
+
+    @cached('Date_Time')
+    def time_between(self):
+        """
+        Time from the point before, the first value is NaT.
+        """
+        date_time = self.df["Date_Time"].values
+        gaps = np.empty(date_time.shape, dtype='timedelta64[ns]')
+        gaps[:1] = np.timedelta64('NaT')
+        gaps[1:] = np.diff(date_time)
+        return self._series(gaps, 'time_between')
+
+    @cached('Latitude', 'Longitude', 'Altitude', 'distance_method')
+    def distance_between(self):
+        """
+        Distance in meters from the point before using self.distance_method, the first value is nan.
+        """
+        altitude = self.df["Altitude"].values if "Altitude" in self.df.columns else None
+        values = geodesic.distance_between(self.df["Latitude"].values, self.df["Longitude"].values, altitude,
+                                           method=self.distance_method)
+        return self._series(values, 'distance_between')
+
+    @cached('distance_between')
+    def cumulative_distance(self):
+        """
+        Distance in meters from the start, the first value is 0.
+        """
+        return self._series(np.nancumsum(self.distance_between.values), 'distance')
+
+    @cached('distance_between', 'time_between', 'min_movement', 'moving_method')
+    def moving_time_between(self):
+        """
+        time_between, with 0 for the points that are not moving by self.moving_method.
+        """
+        kwargs = dict(self.moving_method)
+        if kwargs.get('method', 'simple') == 'simple':
+            kwargs.setdefault('min_movement', self.min_movement)
+        gaps = self.time_between.values
+        is_moving = moving.moving(gaps / np.timedelta64(1, 's'), self.distance_between.values, **kwargs)
+        return self._series(np.where(is_moving, gaps, np.timedelta64(0, 'ns')), 'moving_time_between')
+
+    @cached('Altitude', 'elevation_filter', 'distance_between')
+    def filtered_altitude(self):
+        """
+        Altitude filtered with self.elevation_filter
+        """
+        kwargs = dict(self.elevation_filter)
+        if kwargs.pop('distance', False):
+            kwargs['distance'] = self.cumulative_distance.values
+        values = elevation.filter_altitude(self.df["Altitude"].values, **kwargs)
+        return self._series(values, 'filtered_altitude')
+
+    @cached('Altitude', 'altitude_change', 'filtered_altitude')
+    def elevation_stats(self):
+        if "Altitude" not in self.df.columns:
+            return None
+        altitude = self.df["Altitude"].to_numpy(dtype=np.float64)
+        change = self.altitude_change.values[1:]
+        filtered_ascent, filtered_descent = elevation.ascent_descent(self.filtered_altitude.values)
+        return {
+            "min_elevation": np.nanmin(altitude),
+            "max_elevation": np.nanmax(altitude),
+            "avg_elevation": np.nanmean(altitude),
+            "ascent": change[change > 0].sum(),
+            "descent": change[change < 0].sum(),
+            "filtered_ascent": filtered_ascent,
+            "filtered_descent": filtered_descent,
+        }
+
+    @cached('distance_between')
+    def distance_stats(self):
+        between = self.distance_between.values
+        moved = between[between > 0]
+        if len(moved) == 0:
+            # Never moved or no positions
+            return {'total_distance': np.nansum(between),
+                    'mean_dist': np.nan,
+                    'median_dist': np.nan,
+                    'max_dist': np.nanmax(between) if np.isfinite(between).any() else np.nan,
+                    'min_dist': np.nan
+                    }
+        return {'total_distance': np.nansum(between),
+                'mean_dist': moved.mean(),
+                'median_dist': float(np.median(moved)),
+                'max_dist': np.nanmax(between),
+                'min_dist': moved.min()
+                }
+
+    @cached('Date_Time', 'time_between', 'moving_time_between')
+    def time_stats(self):
+        start_time = self.df["Date_Time"].iloc[0]
+        end_time = self.df["Date_Time"].iloc[-1]
+        gaps = pd.TimedeltaIndex(self.time_between.values[1:])
+        return {
+            "start_time": start_time,
+            "end_time": end_time,
+            "elapsed_duration": end_time - start_time,
+            "activity_time": gaps.sum(),
+            "moving_time": self.moving_time_between.sum(),
+            'mean_gap': gaps.mean(),
+            'median_gap': gaps.median(),
+            'max_gap': gaps.max(),
+            'min_gap': gaps.min()
+            }
+
+    def _calc_moving_time(self, method=None, min_movement=None, **kwargs):
         """
         simple: requires a minimum distance value and if the distance moved in 1 sec is less then this, it is not
         counted as moving. The default os 0.05meters is .1 mph, this is assuming time between points is 1 second, which
         might be wrong.
+        speed, pause, auto_pause: use the speed between points, see moving.METHODS, kwargs are passed to them.
+        The method is kept in self.moving_method, so time() uses it. With method None the current method is kept,
+        kwargs are added to its arguments, and with min_movement None the current min_movement is kept.
         """
-        if method == "simple":
-            self.df["moving_time_between"] = self.df["time_between"]
-            if 'distance_between' in self.df.columns:
-                self.df.loc[self.df["distance_between"] < min_movement, ["moving_time_between"]] = pd.Timedelta(0)
-            else:
-                self.distance()
-                self.df.loc[self.df["distance_between"] < min_movement, ["moving_time_between"]] = pd.Timedelta(0)
-            return self.df["moving_time_between"].sum()
+        if min_movement is not None:
+            self.min_movement = min_movement
+        if method is not None:
+            self.moving_method = dict(method=method, **kwargs)
+        elif kwargs:
+            self.moving_method = dict(self.moving_method, **kwargs)
+        return self.moving_time_between.sum()
 
     def elevation(self):
         """
-        :return: {max:, min:, average:, ascent:, descent:}
-        """
-        # TODO implement api to get Altitude data if it is not in the data.
-        if "Altitude" in self.df.columns:
-            self.min_elevation = self.df["Altitude"].min()
-            self.max_elevation = self.df["Altitude"].max()
-            self.avg_elevation = self.df["Altitude"].mean()
-            self.df["altitude_change"] = self.df["Altitude"].diff()  # differance between rows
-            self.ascent = self.df[self.df["altitude_change"] > 0]["altitude_change"].sum()
-            self.descent = self.df[self.df["altitude_change"] < 0]["altitude_change"].sum()
-            return {
-                "min_elevation": self.min_elevation,
-                "max_elevation": self.max_elevation,
-                "avg_elevation": self.avg_elevation,
-                "ascent": self.ascent,
-                "descent": self.descent,
-            }
+        ascent and descent are the sum of every change in the Altitude, filtered_ascent and filtered_descent are
+        after self.elevation_filter
+        :return: {max:, min:, average:, ascent:, descent:, filtered_ascent:, filtered_descent:}
+        """
+        # For files without Altitude see elevation.fill_altitude
+        r = self.elevation_stats
+        if r is not None:
+            self.min_elevation = r["min_elevation"]
+            self.max_elevation = r["max_elevation"]
+            self.avg_elevation = r["avg_elevation"]
+            self.ascent = r["ascent"]
+            self.descent = r["descent"]
+            self.filtered_ascent = r["filtered_ascent"]
+            self.filtered_descent = r["filtered_descent"]
+            return dict(r)
         else:
             return None
 
@@ -71,96 +323,92 @@ class Track(object):
         activity_time: Total time between points, probably the same asn elapsed_duration
         moving time: there are different methods, now only a very simple method is used
         """
-        self.start_time = self.df.iloc[0]["Date_Time"]
-        self.end_time = self.df.iloc[-1]["Date_Time"]
-        self.df["time_between"] = self.df["Date_Time"].diff()
-        self.elapsed_time = self.end_time - self.start_time
-        self.activity_time = self.df["time_between"].sum()
-        self.moving_time = self._calc_moving_time(method="simple", min_movement=0.05)
-        self.mean_gap = self.df["time_between"].mean()
-        self.median_gap = self.df["time_between"].median()
-        self.max_gap = self.df["time_between"].max()
-        self.min_gap = self.df["time_between"].min()
+        r = self.time_stats
+        self.start_time = r["start_time"]
+        self.end_time = r["end_time"]
+        self.elapsed_time = r["elapsed_duration"]
+        self.activity_time = r["activity_time"]
+        self.moving_time = r["moving_time"]
+        self.mean_gap = r['mean_gap']
+        self.median_gap = r['median_gap']
+        self.max_gap = r['max_gap']
+        self.min_gap = r['min_gap']
+        return dict(r)
 
-        return {
-            "start_time": self.start_time,
-            "end_time": self.end_time,
-            "elapsed_duration": self.elapsed_time,
-            "activity_time": self.activity_time,
-            "moving_time": self.moving_time,
-            'mean_gap': self.mean_gap,
-            'median_gap': self.median_gap,
-            'max_gap': self.max_gap,
-            'min_gap': self.min_gap
-            }
-
-    def distance(self):
+    def distance(self, method=None):
         """
+        method: the distance model, see geodesic.METHODS, None keeps self.distance_method. The altitude change between
+        points is included.
         :return: {'total_distance': self.total_distance}
         """
-        if 'altitude_change' not in self.df.columns:
-            self.elevation()
-        self.df["shift_Longitude"] = self.df.shift(1)["Longitude"]
-        self.df["shift_Latitude"] = self.df.shift(1)["Latitude"]
-        # This is the flat distance between points
-        self.df["distance_between"] = self.df.apply(
-            lambda x: sqrt(
-                (haversine((x["Latitude"], x["Longitude"]),
-                           (x["shift_Latitude"], x["shift_Longitude"]), unit="m",) ** 2
-                 + x["altitude_change"] ** 2)), axis=1)
-        self.df.drop(['shift_Longitude', 'shift_Latitude'], axis=1)
-        self.total_distance = self.df["distance_between"].sum()
-        self.df['distance'] = self.df['distance_between'].cumsum()
-        self.mean_dist = self.df[self.df.distance_between > 0]["distance_between"].mean()
-        self.median_dist = float(self.df[self.df.distance_between > 0]["distance_between"].median())
-        self.max_dist = self.df["distance_between"].max()
-        self.min_dist = self.df[self.df.distance_between > 0]["distance_between"].min()
-        return {'total_distance': self.total_distance,
-                'mean_dist': self.mean_dist,
-                'median_dist': self.median_dist,
-                'max_dist': self.max_dist,
-                'min_dist': self.min_dist
-                }
+        if method is not None:
+            self.distance_method = method
+        r = self.distance_stats
+        self.total_distance = r['total_distance']
+        self.mean_dist = r['mean_dist']
+        self.median_dist = r['median_dist']
+        self.max_dist = r['max_dist']
+        self.min_dist = r['min_dist']
+        return dict(r)
 
-    def place(self, private_token):
+    def place(self, private_token=None, geocoder=None):
         """
-        using mapbox, get place name, "where" the ride was.
-        see
-        https://docs.mapbox.com/api/search/#reverse-geocoding
-        r = requests.get('https://api.mapbox.com/geocoding/v5/mapbox.places/-105.2386,39.4667.json', params=params)
-
-        TODO Add a retry
-        https://findwork.dev/blog/advanced-usage-python-requests-timeouts-retries-hooks/
-        TODO Log errors
+        using mapbox, get place name, "where" the ride was, at the first point with a position.
+        geocoder: geocode.Geocoder to use, its session and cache are shared by all the tracks that use it.
+            If None a Geocoder is made for this call with private_token.
+        Errors are logged and the values are None.
         """
-        params = (('access_token', private_token), ('types', 'place'))
-        longitude, latitude = self.df.iloc[0][['Longitude', 'Latitude']].values
-        try:
-            r = requests.get(f"https://api.mapbox.com/geocoding/v5/mapbox.places/{longitude},{latitude}.json", params=params)
-            self.place_info = r.json()
-            self.place_name = self.place_info['features'][0]['place_name']
+        positions = self.df[['Latitude', 'Longitude']].dropna()
+        if len(positions) == 0:
             return {'place_info': self.place_info, 'place_name': self.place_name}
-        except Exception as e:
-            return {'place_info': self.place_info, 'place_name': self.place_name}  # The Values should be none
+        latitude, longitude = positions.iloc[0].values
+        own = geocoder is None
+        if own:
+            # geocode needs requests, it is only loaded when it is used
+            try:
+                from .geocode import Geocoder
+            except ImportError:
+                from geocode import Geocoder
+            geocoder = Geocoder(private_token)
+        try:
+            r = geocoder.place(latitude, longitude)
+            self.place_info = r['place_info']
+            self.place_name = r['place_name']
+        except GeocodeException as e:
+            _log.error(e)
+        finally:
+            if own:
+                geocoder.close()
+        return {'place_info': self.place_info, 'place_name': self.place_name}
 
     @property
+    @metrics.timed('track.calculate')
     def calculate(self):
         """
         Calculate everything
         """
-        r = self.elevation()
+        r = self.elevation() or {}
         r.update(self.distance())
         r.update(self.time())
         return r
 
 
-    def export_lat_lon_alt(self, file_type='JSON'):
+    def export_lat_lon_alt(self, file_type='JSON', simplify=None, method='rdp', out=None):
         """
         export the latitude and longitude
-        :return: file
+        simplify: tolerance in meters, only export the points simplify.simplify keeps. None exports every point.
+        method: 'rdp' or 'visvalingam', see simplify.METHODS
+        out: for csv, a path or file object, None returns the bytes
+        :return: list of dicts for JSON
         """
+        df = self.df if simplify is None else simplify_track(self.df, simplify, method=method)
         if file_type == 'JSON':
-            return [dict(longitude=r.Longitude, latitude=r.Latitude, altitude=r.Altitude) for r in self.df.itertuples()]
+            return export.records(df)
         elif file_type == 'csv':
-            self.df[['Latitude', 'Longitude']].to_csv('export.csv')
+            return export.csv(df[['Latitude', 'Longitude']], out)
 
+    def export(self, file_type, out=None, **kwargs):
+        """
+        Export df, see export.export for the file types and arguments
+        """
+        return export.export(self.df, file_type, out, **kwargs)
@@ -10,28 +10,29 @@ with open('README.rst') as readme_file:
 with open('HISTORY.rst') as history_file:
     history = history_file.read()
 
-requirements = ['pandas', 'haversine', 'fitdecode', 'xmltodict', 'scipy']
+requirements = ['pandas', 'fitdecode', 'scipy', 'requests']
 
 setup_requirements = ['pytest-runner', ]
 
-test_requirements = ['pytest>=3', ]
+test_requirements = ['pytest>=3', 'haversine']
 
 setup(
     author="Vincent Davis",
     author_email='vincent@heteroskedastic.com',
-    python_requires='>=3.6',
+    python_requires='>=3.9',
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Natural Language :: English',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
-        'Programming Language :: Python :: 3.7',
-        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
     description="Read and analyse gps activity, bike, run, data",
     install_requires=requirements,
+    extras_require={'arrow': ['pyarrow']},
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""Incremental track statistics tests"""
+
+import pytest
+import numpy as np
+from collections import Counter
+from pathlib import Path
+from gpsfun.readers import gpx
+from gpsfun.tracks import Track
+from gpsfun.accumulator import TrackAccumulator, LogHistogram, counter_median
+
+
+@pytest.fixture
+def ride():
+    return gpx(Path(__file__).parent.joinpath('test_data/rallystyle/roubaix/dan_b.gpx'))
+
+
+def check(result, expected):
+    assert result.keys() == expected.keys()
+    for k, v in expected.items():
+        if k == 'median_dist':
+            assert result[k] == pytest.approx(v, rel=0.005), k
+        elif hasattr(v, 'total_seconds'):
+            assert abs((result[k] - v).total_seconds()) < 1e-3, k
+        elif isinstance(v, float):
+            assert result[k] == pytest.approx(v, rel=1e-6), k
+        else:
+            assert result[k] == v, k
+
+
+def test_append_matches_track(ride):
+    acc = TrackAccumulator()
+    for point in ride.to_dict('records'):
+        acc.append(point)
+    check(acc.calculate, Track(ride).calculate)
+
+
+def test_extend_matches_track(ride):
+    acc = TrackAccumulator()
+    for start in range(0, len(ride), 300):
+        acc.extend(ride.iloc[start:start + 300])
+    check(acc.calculate, Track(ride).calculate)
+
+
+def test_missing_altitude_matches_track(ride):
+    ride.loc[ride.index[100:110], 'Altitude'] = np.nan
+    acc = TrackAccumulator()
+    acc.extend(ride)
+    expected = Track(ride).calculate
+    check(acc.calculate, expected)
+    # The points next to a missing altitude count with their flat distance
+    assert not Track(ride).distance_between.iloc[1:].isna().any()
+
+
+def test_streaming_medians():
+    values = np.sort(np.random.default_rng(3).lognormal(size=20001))
+    h = LogHistogram()
+    for v in values:
+        h.add(v)
+    assert h.quantile(0.5) == pytest.approx(np.median(values), rel=0.0025)
+    assert counter_median(Counter([1, 1, 2, 3])) == 1.5
+    assert counter_median(Counter()) is None
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+
+"""Batch processing tests"""
+
+import pytest
+from pathlib import Path
+from gpsfun.batch import process_files, find_files
+
+
+@pytest.fixture
+def roubaix_dir():
+    return Path(__file__).parent.joinpath('test_data/rallystyle/roubaix')
+
+
+def test_find_files(roubaix_dir):
+    assert len(find_files(roubaix_dir)) == 5
+    assert len(find_files(str(roubaix_dir.joinpath('*.gpx')))) == 4
+
+
+@pytest.mark.parametrize('workers, chunksize', [(0, 1), (2, 1), (2, 3)])
+def test_process_files(roubaix_dir, workers, chunksize):
+    results = list(process_files(roubaix_dir, workers=workers, chunksize=chunksize))
+    assert len(results) == 5
+    for r in results:
+        assert r['error'] is None, r['file']
+        assert r['total_distance'] > 0
+        assert r['points'] > 0
+
+
+def test_process_files_errors_and_streams(roubaix_dir, tmp_path):
+    bad = tmp_path.joinpath('bad.gpx')
+    bad.write_text('<gpx><trk>not finished')
+    with open(roubaix_dir.joinpath('dan_b.gpx'), 'rb') as f:
+        results = {Path(r['file']).name: r for r in process_files([str(bad), f], workers=2)}
+    assert results['bad.gpx']['error'].startswith('ParseError')
+    assert results['dan_b.gpx']['error'] is None
+    assert results['dan_b.gpx']['points'] == 2504
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+"""Parse cache tests"""
+
+import os
+import pytest
+import pandas as pd
+from pathlib import Path
+from gpsfun import readers
+from gpsfun.cache import ParseCache
+
+
+@pytest.fixture
+def data_dir():
+    return Path(__file__).parent.joinpath('test_data')
+
+
+def test_cache_roundtrip(data_dir, tmp_path):
+    cache = ParseCache(tmp_path)
+    f = data_dir.joinpath('tcx/test_tcx_2_laps.tcx')
+    df = readers.tcx(f, cache=cache)
+    assert len(os.listdir(tmp_path)) == 1
+    cached = readers.tcx(f, cache=cache)
+    pd.testing.assert_frame_equal(df, cached)
+    # Same content from a file object is a hit
+    with open(f, 'rb') as fo:
+        pd.testing.assert_frame_equal(df, readers.tcx(fo, cache=cache))
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_cache_keys(data_dir, tmp_path):
+    cache = ParseCache(tmp_path)
+    f = data_dir.joinpath('rallystyle/roubaix/dan_b.gpx')
+    readers.gpx(f, cache=cache)
+    readers.read(f, cache=cache)
+    # laps are not cached
+    readers.tcx(data_dir.joinpath('tcx/test_tcx_2_laps.tcx'), laps=True, cache=cache)
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_cache_dtypes(tmp_path):
+    cache = ParseCache(tmp_path)
+    df = pd.DataFrame({'Date_Time': pd.date_range('2020-07-25', periods=3, freq='s', tz='UTC'),
+                       'naive': pd.date_range('2020-07-25', periods=3, freq='s'),
+                       'lap': pd.Categorical([0, 0, 1]),
+                       'name': ['a', None, 'c'],
+                       'HeartRate': pd.Series([1, 2, 3], dtype='float32')})
+    cache.put('k', df)
+    pd.testing.assert_frame_equal(df, cache.get('k'))
+    assert cache.get('missing') is None
+
+
+def test_cache_lru(data_dir, tmp_path):
+    cache = ParseCache(tmp_path)
+    files = [data_dir.joinpath(f'tictoc/{n}.fit') for n in
+             ['2020-10-29-09-19-23', '2020-10-29-19-10-19', '2020-10-29-19-28-11']]
+    readers.fit(files[0], cache=cache)
+    entry_size = cache.size()
+    cache.max_bytes = int(entry_size * 2.5)
+    readers.fit(files[1], cache=cache)
+    first = sorted(os.listdir(tmp_path), key=lambda n: os.stat(tmp_path.joinpath(n)).st_mtime)
+    os.utime(tmp_path.joinpath(first[0]), (0, 0))
+    os.utime(tmp_path.joinpath(first[1]), (1, 1))
+    readers.fit(files[2], cache=cache)
+    remaining = os.listdir(tmp_path)
+    assert len(remaining) == 2
+    assert first[0] not in remaining
+    assert cache.size() <= cache.max_bytes
+
+
+def test_cache_file_position(data_dir, tmp_path):
+    cache = ParseCache(tmp_path)
+    with open(data_dir.joinpath('tcx/test_tcx_2_laps.tcx'), 'rb') as fo:
+        df = readers.tcx(fo, cache=cache)
+        assert fo.tell() == 0
+        pd.testing.assert_frame_equal(df, readers.tcx(fo, cache=cache))
+
+
+class _KeyCache(ParseCache):
+    """Every get is a hit, so only the keys are looked at"""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.keys = []
+
+    def get(self, key):
+        self.keys.append(key)
+        return pd.DataFrame()
+
+
+def test_cache_key_arguments(data_dir, tmp_path):
+    cache = _KeyCache(tmp_path)
+    f = data_dir.joinpath('rallystyle/roubaix/dan_b.gpx')
+    readers.gpsbabel(f, cache=cache)
+    readers.gpsbabel(f, None, 30, cache=cache)
+    readers.gpsbabel(f, timeout=60, cache=cache)
+    readers.gpsbabel(f, '.gpx', cache=cache)
+    assert len(set(cache.keys[:3])) == 1
+    assert cache.keys[3] != cache.keys[0]
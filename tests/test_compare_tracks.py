@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+"""Track alignment tests"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+from gpsfun import geodesic
+from gpsfun.readers import gpx
+from gpsfun.compare_tracks import align_tracks
+
+
+def reference_alignment(t1, t2, gap_penalty):
+    """Plain double loop Needleman-Wunsch to check against"""
+    n, m = len(t1), len(t2)
+    f = np.zeros((n + 1, m + 1))
+    f[:, 0] = gap_penalty * np.arange(n + 1)
+    f[0, :] = gap_penalty * np.arange(m + 1)
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            s = -geodesic.haversine(t1[i - 1, 0], t1[i - 1, 1], t2[j - 1, 0], t2[j - 1, 1])
+            f[i, j] = max(f[i - 1, j - 1] + s, f[i - 1, j] + gap_penalty, f[i, j - 1] + gap_penalty)
+    return f[n, m]
+
+
+def alignment_score(t1, t2, a1, a2, gap_penalty):
+    both = (a1 >= 0) & (a2 >= 0)
+    d = geodesic.haversine(t1[a1[both], 0], t1[a1[both], 1], t2[a2[both], 0], t2[a2[both], 1])
+    return -d.sum() + gap_penalty * (~both).sum()
+
+
+@pytest.fixture
+def ride():
+    df = gpx(Path(__file__).parent.joinpath('test_data/rallystyle/roubaix/dan_b.gpx'))
+    return df[['Latitude', 'Longitude']].to_numpy(dtype=np.float64)
+
+
+def test_align_same_track(ride):
+    a1, a2 = align_tracks(ride[:300], ride[:300], gap_penalty=-50)
+    assert (a1 == np.arange(300)).all()
+    assert (a2 == np.arange(300)).all()
+
+
+def test_align_matches_reference(ride):
+    rng = np.random.default_rng(1)
+    t1 = ride[:60]
+    t2 = ride[5:70:2] + rng.normal(0, 0.00005, (33, 2))
+    a1, a2 = align_tracks(t1, t2, gap_penalty=-20)
+    # Every point is in the alignment once, in order
+    assert (a1[a1 >= 0] == np.arange(60)).all()
+    assert (a2[a2 >= 0] == np.arange(33)).all()
+    assert alignment_score(t1, t2, a1, a2, -20) == pytest.approx(reference_alignment(t1, t2, -20))
+
+
+def test_align_banded(ride):
+    t1 = ride[:400]
+    t2 = ride[:400:2]
+    full = align_tracks(t1, t2, gap_penalty=-30)
+    banded = align_tracks(t1, t2, gap_penalty=-30, band=40)
+    assert (full[0] == banded[0]).all() and (full[1] == banded[1]).all()
+    with pytest.raises(ValueError):
+        align_tracks(t1, t2, gap_penalty=-30, band=0.1)
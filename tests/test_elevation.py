@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+"""DEM elevation tests"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+from gpsfun.readers import gpx
+from gpsfun.tracks import Track
+from gpsfun.elevation import DEM, hgt_name, fill_altitude, VOID, filter_altitude, ascent_descent, moving_average, \
+    hysteresis
+
+
+@pytest.fixture
+def dem(tmp_path):
+    """A 3 arc second tile for N40W106 that is a plane, so bilinear interpolation is exact"""
+    rows, cols = np.mgrid[0:1201, 0:1201]
+    grid = (1500 + rows + 2 * cols).astype('>i2')
+    grid[0, 0] = VOID
+    grid.tofile(tmp_path / 'N40W106.hgt')
+    return DEM(tmp_path, max_tiles=2)
+
+
+def test_hgt_name():
+    assert hgt_name(39.7, -105.5) == 'N39W106.hgt'
+    assert hgt_name(-0.5, 0.5) == 'S01E000.hgt'
+
+
+def test_bilinear(dem):
+    lat = np.array([40.5, 40.25, 40.999, 39.5, np.nan, 40.99999])
+    lon = np.array([-105.5, -105.9, -105.999, -105.5, -105.5, -106.0])
+    z = dem.elevation(lat, lon)
+    expected = 1500 + (41 - lat) * 1200 + 2 * (lon + 106) * 1200
+    assert z[:3] == pytest.approx(expected[:3])
+    # No tile, no position, next to a void
+    assert np.isnan(z[3:]).all()
+
+
+def test_tile_cache(dem):
+    for lat in [40.5, 41.5, 42.5, 40.5]:
+        dem.elevation([lat], [-105.5])
+    assert list(dem._tiles) == ['N42W106.hgt', 'N40W106.hgt']
+
+
+def test_fill_altitude(dem):
+    df = gpx(Path(__file__).parent.joinpath('test_data/rallystyle/roubaix/dan_b.gpx'))
+    df.loc[df.index[:10], 'Altitude'] = np.nan
+    filled = fill_altitude(df, dem)
+    assert df.Altitude.isna().sum() == 10
+    assert filled.Altitude.notna().all()
+    assert (filled.Altitude[10:] == df.Altitude[10:]).all()
+    replaced = fill_altitude(df.drop(columns='Altitude'), dem)
+    assert str(replaced.Altitude.dtype) == 'float32'
+    assert Track(replaced).elevation()['min_elevation'] > 1500
+    corrected = fill_altitude(df, dem, replace=True)
+    assert (corrected.Altitude == replaced.Altitude).all()
+
+
+def test_filters():
+    rng = np.random.default_rng(0)
+    climb = np.linspace(1500, 1600, 2000)
+    noisy = climb + rng.normal(0, 1, 2000)
+    noisy[100] = np.nan
+    raw_ascent, _ = ascent_descent(noisy)
+    assert raw_ascent > 500
+    for method, kwargs in [('moving_average', {'window': 31}), ('savgol', {'window': 31}),
+                           ('hysteresis', {'threshold': 8})]:
+        filtered = filter_altitude(noisy, method, **kwargs)
+        assert np.isnan(filtered[100]) and np.isfinite(np.delete(filtered, 100)).all()
+        ascent, descent = ascent_descent(filtered)
+        assert 90 < ascent < 130, method
+        assert descent > -30, method
+    # A window in meters
+    distance = np.arange(2000) * 2.0
+    assert np.allclose(moving_average(noisy, 20, distance=distance), moving_average(noisy, 11), equal_nan=True)
+
+
+def test_hysteresis_loop():
+    x = np.random.default_rng(1).normal(0, 3, 1000).cumsum()
+    y = []
+    for v in x:
+        y.append(v if not y else min(max(y[-1], v - 2), v + 2))
+    assert np.allclose(hysteresis(x, 4), y)
+
+
+def test_track_filtered_ascent():
+    t = Track(gpx(Path(__file__).parent.joinpath('test_data/problems/jeepman21_elevation_problems.gpx')))
+    r = t.elevation()
+    assert r['filtered_ascent'] < r['ascent']
+    t.elevation_filter = {'method': 'moving_average', 'window': 50, 'distance': True}
+    assert t.elevation()['filtered_ascent'] != r['filtered_ascent']
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""Event scoring tests"""
+
+import pytest
+from pathlib import Path
+from datetime import timedelta
+from gpsfun.readers import gpx
+from gpsfun.rallystyle import RallyResults
+from gpsfun.event import EventScorer
+
+
+@pytest.fixture
+def roubaix():
+    return [{'Segment_name': 'Ride Start: lap 1',
+             'location': {'lat': 40.117348, 'lon': -105.258836},
+             'type_name': 'transport',
+             'type_args': {'timed': None}
+             },
+            {'Segment_name': 'End lap 1, Refuel, ride to start',
+             'location': {'lat': 40.116263, 'lon': -105.257817},
+             'type_name': 'transport',
+             'type_args': {'timed': None},
+             },
+            {'Segment_name': 'Race: Lap two',
+             'location': {'lat': 40.117348, 'lon': -105.258836},
+             'type_name': 'timed',
+             'type_args': None,
+             },
+            {'Segment_name': 'Finish',
+             'location': {'lat': 40.116263, 'lon': -105.257817},
+             'type': 'end'
+             }
+            ]
+
+
+@pytest.fixture
+def roubaix_dir():
+    return Path(__file__).parent.joinpath('test_data/rallystyle/roubaix')
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_score_event(roubaix, roubaix_dir, workers):
+    table = EventScorer(roubaix).score(roubaix_dir, workers=workers)
+    assert table.index.tolist() == ['dan_b', 'dean_d', 'jennifer_g', 'michelle_m', 'richard_e']
+    assert table['error'].isna().all()
+    assert table.loc['dan_b', 'Ride Start: lap 1'] == timedelta(hours=1, minutes=2, seconds=2)
+    assert table.loc['dan_b', 'total_timed'] == timedelta(minutes=50, seconds=9)
+    assert table.loc['richard_e', 'total_timed'] == timedelta(hours=1, minutes=8, seconds=57)
+    assert sorted(table['rank']) == [1, 2, 3, 4, 5]
+    assert table['total_timed'].idxmin() == table['rank'].idxmin()
+
+
+def test_score_matches_rally_results(roubaix, roubaix_dir):
+    df = gpx(roubaix_dir.joinpath('dan_b.gpx'))
+    rs = RallyResults(df, roubaix)
+    rs.calc_results()
+    result = EventScorer(roubaix).score_one(df)
+    for r, name in zip(rs.results[:-1], ['Ride Start: lap 1', 'End lap 1, Refuel, ride to start', 'Race: Lap two']):
+        assert result[name] == r['duration']
+    assert result['total_timed'] == rs.results[-1]['total_timed']
+
+
+def test_rider_errors_are_isolated(roubaix, roubaix_dir, tmp_path):
+    df = gpx(roubaix_dir.joinpath('dan_b.gpx'))
+    bad = tmp_path.joinpath('bad.gpx')
+    bad.write_text('<gpx><trk>not finished')
+    riders = {'short': df.iloc[:1000], 'dan_b': df, 'far': df.assign(Latitude=df['Latitude'] + 1), 'bad': str(bad)}
+    table = EventScorer(roubaix).score(riders, workers=2, chunksize=2)
+    assert table.index.tolist() == ['short', 'dan_b', 'far', 'bad']
+    assert table.loc['short', 'error'].startswith('MatchCheckpointsException')
+    assert table.loc['far', 'error'].startswith('MatchCheckpointsException')
+    assert table.loc['bad', 'error'].startswith('ParseError')
+    assert table.loc['dan_b', 'error'] is None
+    assert table.loc['dan_b', 'rank'] == 1
+    assert table['rank'].isna().sum() == 3
+
+
+def test_repeated_segment_names(roubaix):
+    roubaix[2]['Segment_name'] = roubaix[0]['Segment_name']
+    assert EventScorer(roubaix).names[:3] == ['0: Ride Start: lap 1', 'End lap 1, Refuel, ride to start',
+                                              '2: Ride Start: lap 1']
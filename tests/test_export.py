@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""Export tests"""
+
+import io
+import json
+import pytest
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from gpsfun.readers import gpx
+from gpsfun.tracks import Track
+from gpsfun.export import export, encode_polyline
+
+
+@pytest.fixture
+def ride():
+    return gpx(Path(__file__).parent.joinpath('test_data/rallystyle/roubaix/dan_b.gpx'))
+
+
+def decode_polyline(encoded, precision=5):
+    """The reference decoder, one character at a time"""
+    values, shift, result = [], 0, 0
+    for c in encoded:
+        b = ord(c) - 63
+        result |= (b & 0x1f) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+            shift, result = 0, 0
+    points = np.cumsum(np.array(values).reshape(-1, 2), axis=0)
+    return points / 10 ** precision
+
+
+def test_polyline():
+    # The example from the Google documentation
+    assert encode_polyline([38.5, 40.7, 43.252], [-120.2, -120.95, -126.453]) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+
+def test_polyline_roundtrip(ride):
+    encoded = export(ride, 'polyline')
+    points = decode_polyline(encoded)
+    assert np.allclose(points, ride[['Latitude', 'Longitude']].values, atol=0.6e-5)
+
+
+def test_geojson(ride, tmp_path):
+    export(ride, 'geojson', tmp_path / 'ride.geojson', simplify=5)
+    feature = json.loads((tmp_path / 'ride.geojson').read_text())
+    coordinates = feature['geometry']['coordinates']
+    assert feature['geometry']['type'] == 'LineString'
+    assert 10 < len(coordinates) < len(ride)
+    assert coordinates[0] == pytest.approx([ride.Longitude[0], ride.Latitude[0], ride.Altitude[0]])
+
+
+def test_npy(ride):
+    array = np.load(io.BytesIO(export(ride, 'npy')))
+    assert array.dtype.names == tuple(ride.columns)
+    assert (array['Latitude'] == ride.Latitude.values).all()
+    assert (array['Date_Time'] == ride.Date_Time.values.view(np.int64)).all()
+
+
+@pytest.mark.parametrize('file_type', ['parquet', 'feather'])
+def test_arrow(ride, file_type):
+    pytest.importorskip('pyarrow')
+    buffer = io.BytesIO()
+    Track(ride).export(file_type, buffer)
+    result = getattr(pd, f'read_{file_type}')(io.BytesIO(buffer.getvalue()))
+    assert result.equals(ride)
+    assert export(ride, file_type) == buffer.getvalue()
+
+
+def test_csv(ride):
+    data = Track(ride).export_lat_lon_alt('csv')
+    assert pd.read_csv(io.BytesIO(data)).shape == (len(ride), 2)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""Reverse geocoding tests against a local server"""
+
+import json
+import asyncio
+import threading
+import pytest
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from gpsfun.geocode import Geocoder, PlaceCache, geohash
+from gpsfun.exceptions import GeocodeException
+from gpsfun.readers import gpx
+from gpsfun.tracks import Track
+
+
+@pytest.fixture
+def server():
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            if 'fail' in self.path and requests.count(self.path) < 3:
+                self.send_response(503)
+                self.end_headers()
+                return
+            if 'broken' in self.path:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = json.dumps({'features': [{'place_name': 'Boulder, Colorado, United States'}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}", requests
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_geohash():
+    assert geohash(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+
+
+def test_place_cache(server, tmp_path):
+    url, requests = server
+    cache = PlaceCache(tmp_path / 'places.sqlite')
+    with Geocoder('token', base_url=url, cache=cache) as geocoder:
+        assert geocoder.place(40.117348, -105.258836)['place_name'] == 'Boulder, Colorado, United States'
+        # Same cell
+        geocoder.place(40.117349, -105.258837)
+    assert len(requests) == 1
+    assert 'access_token=token' in requests[0]
+    cache.close()
+    with Geocoder('token', base_url=url, cache=PlaceCache(tmp_path / 'places.sqlite')) as geocoder:
+        geocoder.place(40.117348, -105.258836)
+    assert len(requests) == 1
+
+
+def test_retry_and_errors(server):
+    url, requests = server
+    with Geocoder('token', base_url=url + '/fail', backoff_factor=0) as geocoder:
+        assert geocoder.place(40.1, -105.2)['place_name'] == 'Boulder, Colorado, United States'
+    assert len(requests) == 3
+    with Geocoder('token', base_url=url + '/broken', backoff_factor=0) as geocoder:
+        with pytest.raises(GeocodeException):
+            geocoder.place(40.1, -105.2)
+
+
+def test_places_async(server):
+    url, requests = server
+    points = [(40 + i / 10, -105.0) for i in range(20)] + [(40.0, -105.0)]
+    with Geocoder('token', base_url=url, max_concurrency=4) as geocoder:
+        results = asyncio.run(geocoder.places(points))
+    assert len(results) == 21
+    assert len(requests) == 20
+
+
+def test_track_place(server):
+    url, requests = server
+    t = Track(gpx(Path(__file__).parent.joinpath('test_data/rallystyle/roubaix/dan_b.gpx')))
+    with Geocoder('token', base_url=url) as geocoder:
+        assert t.place(geocoder=geocoder)['place_name'] == 'Boulder, Colorado, United States'
+    with Geocoder('token', base_url=url + '/broken', backoff_factor=0) as geocoder:
+        assert Track(t.df).place(geocoder=geocoder)['place_name'] is None
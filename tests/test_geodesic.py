@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+"""Tests for the vectorized distance functions"""
+
+import pytest
+import numpy as np
+from haversine import haversine
+from gpsfun import geodesic
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(42)
+    lat = 39.7 + np.cumsum(rng.normal(0, 0.0001, 1000))
+    lon = -105.5 + np.cumsum(rng.normal(0, 0.0001, 1000))
+    alt = 2200 + np.cumsum(rng.normal(0, 0.5, 1000))
+    return lat, lon, alt
+
+
+def test_haversine_matches_package(points):
+    lat, lon, _ = points
+    expected = np.array([haversine((lat[i], lon[i]), (lat[i + 1], lon[i + 1]), unit='m') for i in range(len(lat) - 1)])
+    result = geodesic.haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    assert np.allclose(result, expected, rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize('method, atol', [('cosines', 0.5), ('equirectangular', 1e-3), ('vincenty', 0.1)])
+def test_methods_close_to_haversine(points, method, atol):
+    lat, lon, _ = points
+    expected = geodesic.haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    result = geodesic.distance(lat[:-1], lon[:-1], lat[1:], lon[1:], method=method)
+    # The ellipsoid and sphere differ by up to ~0.5%
+    assert np.allclose(result, expected, rtol=0.005 if method == 'vincenty' else 0, atol=atol)
+
+
+def test_vincenty_known_distance():
+    # Flinders Peak to Buninyong, the example from Vincenty's paper
+    lat1, lon1 = -(37 + 57 / 60 + 3.72030 / 3600), 144 + 25 / 60 + 29.52440 / 3600
+    lat2, lon2 = -(37 + 39 / 60 + 10.15610 / 3600), 143 + 55 / 60 + 35.38390 / 3600
+    assert geodesic.vincenty(lat1, lon1, lat2, lon2) == pytest.approx(54972.271, abs=1e-3)
+
+
+def test_vincenty_antipodal_falls_back():
+    d = geodesic.vincenty(np.array([0.0]), np.array([0.0]), np.array([0.5]), np.array([179.7]))
+    assert np.isfinite(d).all()
+
+
+def test_distance_between(points):
+    lat, lon, alt = points
+    d = geodesic.distance_between(lat, lon, alt)
+    assert np.isnan(d[0])
+    flat = geodesic.haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    assert np.allclose(d[1:], np.sqrt(flat ** 2 + np.diff(alt) ** 2))
+
+
+def test_unknown_method(points):
+    lat, lon, _ = points
+    with pytest.raises(ValueError):
+        geodesic.distance_between(lat, lon, method='flat_earth')
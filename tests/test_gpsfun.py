@@ -2,10 +2,16 @@
 
 """Basic functional Tests for `gpsfun` package."""
 
+import io
+import shutil
+import struct
 import pytest
 import unittest
+import pandas as pd
 from pathlib import Path
-from gpsfun.readers import tcx, gpx, gpsbabel
+from fitdecode.utils import compute_crc
+from gpsfun.readers import tcx, gpx, gpsbabel, fit, fit_session, read, GPSBabelPool, _unicsv_frame
+from gpsfun.exceptions import GPSBabelNotFoundException, GPSBabelInputException
 from gpsfun.tracks import Track
 from gpsfun.rallystyle import RallyResults
 
@@ -38,8 +44,45 @@ def test_gpsbabel_stream(all_files):
             df = gpsbabel(f)
             assert {'Latitude', 'Longitude', 'Date_Time'}.intersection(set(df.columns)) == \
                    {'Latitude', 'Longitude', 'Date_Time'}, f"failing file: {str(f)}"
+            assert f.tell() == 0
 
 
+@pytest.mark.skipif(shutil.which('gpsbabel') is None, reason="gpsbabel is not installed")
+def test_gpsbabel_pool(all_files, tmp_path):
+    bad = tmp_path.joinpath('bad.gpx')
+    bad.write_text('<gpx><trk>not finished')
+    files = [f for f in all_files if f.suffix in ['.tcx', '.gpx', '.fit']] + [bad]
+    with GPSBabelPool(max_workers=2) as pool:
+        results = list(pool.map(files, return_exceptions=True))
+    assert isinstance(results[-1], GPSBabelInputException)
+    for f, df in zip(files[:-1], results):
+        assert len(df) == len(gpsbabel(f)), f"failing file: {str(f)}"
+
+
+@pytest.mark.skipif(shutil.which('gpsbabel') is not None, reason="gpsbabel is installed")
+def test_gpsbabel_not_installed(all_files):
+    with pytest.raises(GPSBabelNotFoundException):
+        gpsbabel(all_files[0], file_ext='.gpx')
+    # It is still a FileNotFoundError like before
+    with pytest.raises(FileNotFoundError):
+        gpsbabel(all_files[0], file_ext='.gpx')
+
+
+def test_gpsbabel_unknown_type():
+    with pytest.raises(GPSBabelInputException):
+        gpsbabel(io.BytesIO(b'a,b'), file_ext='.csv')
+
+
+def test_gpsbabel_missing_time():
+    # unicsv as gpsbabel writes it, the second point has no date or time
+    df = pd.read_csv(io.StringIO("No,Latitude,Longitude,Altitude,Date,Time\n"
+                                 "1,40.1,-105.2,1640.1,2020/07/25,14:16:32\n"
+                                 "2,40.2,-105.3,1641.0,,\n"))
+    df = _unicsv_frame(df)
+    assert str(df['Date_Time'].dtype) == 'datetime64[ns, UTC]'
+    assert df['Date_Time'].iloc[0] == pd.Timestamp('2020-07-25 14:16:32', tz='UTC')
+    assert df['Date_Time'].isna().tolist() == [False, True]
+
 
 def test_gpx_tracks(all_files):
     """
@@ -57,6 +100,82 @@ def test_gpx_tracks(all_files):
             assert t.start_time < t.end_time, f"failing file: {str(f)}"
 
 
+def test_gpx_stream_reader():
+    parent_dir = Path(__file__).parent
+    df = gpx(parent_dir.joinpath('test_data/rallystyle/roubaix/dan_b.gpx'))
+    assert len(df) == 2504
+    assert {'Latitude', 'Longitude', 'Altitude', 'Date_Time', 'HeartRate', 'Temp'} == set(df.columns)
+    assert df.HeartRate.iloc[0] == 72
+    assert 'lap' not in df.columns
+
+
+def test_gpx_multiple_segments():
+    points = '<trkpt lat="40.1{0}" lon="-105.2{0}"><ele>16{0}</ele><time>2020-07-25T14:16:3{0}Z</time>' \
+             '<extensions><ns3:TrackPointExtension><ns3:hr>7{0}</ns3:hr></ns3:TrackPointExtension>' \
+             '</extensions></trkpt>'
+    doc = '<gpx xmlns="http://www.topografix.com/GPX/1/1" ' \
+          'xmlns:ns3="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">' \
+          f'<trk><trkseg>{points.format(1)}{points.format(2)}</trkseg></trk>' \
+          f'<trk><trkseg>{points.format(3)}</trkseg><trkseg>{points.format(4)}</trkseg></trk></gpx>'
+    df = gpx(io.BytesIO(doc.encode()))
+    assert len(df) == 4
+    assert df.lap.tolist() == [0, 0, 1, 2]
+    assert df.HeartRate.tolist() == [71, 72, 73, 74]
+    assert df.Date_Time.is_monotonic_increasing
+
+
+def test_tcx_laps():
+    parent_dir = Path(__file__).parent
+    df, laps = tcx(parent_dir.joinpath('test_data/tcx/test_tcx_2_laps.tcx'), laps=True)
+    assert len(df) == 240
+    assert df.lap.tolist() == [0] * 120 + [1] * 120
+    for c in ['Latitude', 'Longitude', 'Altitude', 'Date_Time', 'Distance', 'HeartRate', 'Cadence', 'Speed', 'Power']:
+        assert c in df.columns
+    assert df.HeartRate.iloc[0] == 72
+    assert df.Power.iloc[0] == 150
+    assert df.Latitude.isna().sum() == 5  # Trackpoints without a Position
+    assert len(laps) == 2
+    assert laps.TotalTimeSeconds.tolist() == [1507.0, 401.0]
+    assert laps.AverageHeartRateBpm.tolist() == [101, 109]
+    assert laps.AvgWatts.tolist() == [165, 166]
+    assert laps.TriggerMethod.tolist() == ['Manual', 'Manual']
+    assert laps.StartTime.iloc[1] == df[df.lap == 1].Date_Time.iloc[0]
+
+
+def test_fit_reader():
+    parent_dir = Path(__file__).parent
+    fit_file = parent_dir.joinpath('test_data/fit/has_2_laps.fit')
+    df, laps, session = fit(str(fit_file), laps=True, session=True)
+    assert len(df) == 13173
+    assert {'Latitude', 'Longitude', 'Altitude', 'Date_Time', 'HeartRate', 'Power', 'lap'}.issubset(df.columns)
+    assert df.Latitude.iloc[0] == pytest.approx(473184666 * 180 / 2 ** 31)
+    assert str(df.Date_Time.iloc[0]) == '2020-07-06 17:53:01+00:00'
+    assert df.lap.unique().tolist() == [0, 1]
+    assert len(laps) == 2
+    assert laps.lap_trigger.tolist() == ['manual', 'session_end']
+    assert session['num_laps'] == 2
+    assert session['total_distance'] == df.Distance.iloc[-1]
+
+
+def test_fit_reader_stream():
+    parent_dir = Path(__file__).parent
+    fit_file = parent_dir.joinpath('test_data/tictoc/2020-10-29-19-10-19.fit')
+    with open(fit_file, 'rb') as f:
+        from_bytes = fit(f.read())
+    with open(fit_file, 'rb') as f:
+        from_stream = fit(f)
+    assert from_bytes.equals(from_stream)
+    assert fit_session(str(fit_file))['sport'] == 'cycling'
+
+
+def test_read_compressed(all_files):
+    files = [x for x in all_files if x.suffix in ['.gz', '.zip']]
+    assert len(files) > 0
+    for f in files:
+        df = read(str(f))
+        assert {'Latitude', 'Longitude', 'Date_Time'}.issubset(df.columns), f"failing file: {str(f)}"
+
+
 def test_tcx_tracks(all_files):
     '''
     uses tcx not gpsbabel
@@ -112,5 +231,110 @@ def test_rallystyle_basic(rally_files, roubaix):
 
         rs.calc_results()
 
+
+def test_reader_schema(all_files):
+    from gpsfun import col
+    files = [f for f in all_files if f.suffix in ['.gpx', '.tcx', '.fit']]
+    for f in files:
+        df = read(f)
+        for c in df.columns:
+            assert str(df[c].dtype) == col.schema[c], f"failing file: {str(f)}, column {c}"
+
+
+def test_track_does_not_change_df():
+    parent_dir = Path(__file__).parent
+    df = gpx(parent_dir.joinpath('test_data/rallystyle/roubaix/dan_b.gpx'))
+    before = df.copy()
+    t = Track(df)
+    r = t.calculate
+    assert df.equals(before)
+    assert r['total_distance'] == pytest.approx(t.cumulative_distance.iloc[-1])
+    assert r['ascent'] == pytest.approx(t.altitude_change.clip(lower=0).sum())
+    assert r['moving_time'] == t.moving_time_between.sum()
+    assert t.time_between.index.equals(df.index)
+
+
+def test_track_cache():
+    parent_dir = Path(__file__).parent
+    t = Track(gpx(parent_dir.joinpath('test_data/rallystyle/roubaix/dan_b.gpx')))
+    r = t.calculate
+    between = t.distance_between
+    assert t.calculate == r
+    assert t.distance_between is between
+    t.invalidate('Altitude')
+    assert 'distance_between' not in t._cache and 'moving_time_between' not in t._cache
+    assert 'time_between' in t._cache
+    assert t.distance('vincenty')['total_distance'] != r['total_distance']
+    t.df = t.df.iloc[:100]
+    assert t.distance_between.shape == (100,)
+
+    # The cached properties are found on a subclass too
+    class MyTrack(Track):
+        pass
+
+    df = gpx(parent_dir.joinpath('test_data/rallystyle/roubaix/dan_b.gpx'))
+    t = MyTrack(df)
+    assert t.calculate['total_distance'] == r['total_distance']
+    t.distance_method = 'vincenty'
+    vincenty = Track(df)
+    vincenty.distance_method = 'vincenty'
+    assert t.calculate['total_distance'] == vincenty.calculate['total_distance'] != r['total_distance']
+
+
+def test_track_settings_are_kept():
+    t = Track(gpx(Path(__file__).parent.joinpath('test_data/rallystyle/roubaix/dan_b.gpx')))
+    haversine = t.calculate['total_distance']
+    t.distance_method = 'vincenty'
+    vincenty = t.calculate['total_distance']
+    assert vincenty != haversine
+    assert t.distance_method == 'vincenty'
+    assert t.distance()['total_distance'] == vincenty
+    paused = t._calc_moving_time('pause', min_movement=0.1, min_pause=30)
+    assert t.calculate['moving_time'] == paused
+    assert t._calc_moving_time() == paused
+    assert t.moving_method == {'method': 'pause', 'min_pause': 30} and t.min_movement == 0.1
+
+
+def test_stationary_track():
+    import numpy as np
+    import pandas as pd
+    df = pd.DataFrame({'Latitude': [40.0] * 5, 'Longitude': [-105.0] * 5,
+                       'Date_Time': pd.date_range('2020-01-01', periods=5, freq='1s', tz='UTC')})
+    r = Track(df).calculate
+    assert r['total_distance'] == 0
+    assert np.isnan(r['mean_dist']) and np.isnan(r['median_dist']) and np.isnan(r['min_dist'])
+    assert r['moving_time'] == pd.Timedelta(0)
+
+
+def test_points_without_time():
+    points = '<trkpt lat="40.1" lon="-105.1"><time>2020-07-25T14:16:32Z</time></trkpt>' \
+             '<trkpt lat="40.2" lon="-105.2"><ele>1600</ele></trkpt>' \
+             '<trkpt lat="40.3" lon="-105.3"><time>2020-07-25T14:16:34Z</time></trkpt>'
+    df = gpx(io.BytesIO(f'<gpx><trk><trkseg>{points}</trkseg></trk></gpx>'.encode()))
+    assert df['Date_Time'].isna().tolist() == [False, True, False]
+    trackpoints = '<Trackpoint><Time>2020-07-25T14:16:32Z</Time><Position><LatitudeDegrees>40.1</LatitudeDegrees>' \
+                  '<LongitudeDegrees>-105.1</LongitudeDegrees></Position></Trackpoint>' \
+                  '<Trackpoint><Position><LatitudeDegrees>40.2</LatitudeDegrees>' \
+                  '<LongitudeDegrees>-105.2</LongitudeDegrees></Position></Trackpoint>'
+    df = tcx(io.BytesIO(f'<TrainingCenterDatabase><Activities><Activity><Lap><Track>{trackpoints}</Track></Lap>'
+                        f'</Activity></Activities></TrainingCenterDatabase>'.encode()))
+    assert df['Date_Time'].isna().tolist() == [False, True]
+    assert fit(_fit_records([(1000, 40.1, -105.1), (None, 40.2, -105.2)]))['Date_Time'].isna().tolist() == [False, True]
+
+
+def _fit_records(records):
+    """A fit file with a record message for each (timestamp or None, lat, lon)"""
+    semicircles = 2 ** 31 / 180
+    with_time = struct.pack('<BBBHB', 0x40, 0, 0, 20, 3) + bytes([253, 4, 0x86, 0, 4, 0x85, 1, 4, 0x85])
+    without_time = struct.pack('<BBBHB', 0x41, 0, 0, 20, 2) + bytes([0, 4, 0x85, 1, 4, 0x85])
+    data = with_time + without_time
+    for timestamp, lat, lon in records:
+        position = struct.pack('<ii', round(lat * semicircles), round(lon * semicircles))
+        data += b'\x01' + position if timestamp is None else b'\x00' + struct.pack('<I', timestamp) + position
+    header = struct.pack('<BBHI4s', 14, 0x10, 2093, len(data), b'.FIT')
+    header += struct.pack('<H', compute_crc(header))
+    return header + data + struct.pack('<H', compute_crc(header + data))
+
+
 if __name__ == '__main__':
     unittest.main()
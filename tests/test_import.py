@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+"""Import time tests, each import runs in a new interpreter"""
+
+import sys
+import json
+import pytest
+import subprocess
+from pathlib import Path
+
+IMPORT_BUDGET = 0.1  # seconds for import gpsfun
+ROOT = str(Path(__file__).parent.parent)
+
+
+def run(code):
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(out)
+
+
+def test_import_budget():
+    seconds, modules = run("import sys, json, time\n"
+                           "start = time.perf_counter()\n"
+                           "import gpsfun\n"
+                           "seconds = time.perf_counter() - start\n"
+                           "print(json.dumps([seconds, [m for m in ('numpy', 'pandas') if m in sys.modules]]))")
+    assert seconds < IMPORT_BUDGET
+    assert modules == []
+
+
+def test_heavy_dependencies_are_lazy():
+    modules = run("import sys, json\n"
+                  "import gpsfun.tracks, gpsfun.readers, gpsfun.rallystyle, gpsfun.tic_toc, gpsfun.event, gpsfun.batch\n"
+                  "print(json.dumps([m for m in ('scipy', 'requests', 'fitdecode') if m in sys.modules]))")
+    assert modules == []
+
+
+def test_lazy_api():
+    import gpsfun
+    from gpsfun.tracks import Track
+    from gpsfun.readers import read
+    assert gpsfun.Track is Track
+    assert gpsfun.read is read
+    assert gpsfun.geodesic.__name__ == 'gpsfun.geodesic'
+    assert 'EventScorer' in dir(gpsfun)
+    with pytest.raises(AttributeError):
+        gpsfun.not_a_module
+
+
+def test_export_is_the_module():
+    modules = run("import sys, json\n"
+                  "import gpsfun\n"
+                  "before = gpsfun.export.__name__\n"
+                  "import gpsfun.tracks\n"
+                  "print(json.dumps([before, gpsfun.export.__name__, gpsfun.export.export.__name__]))")
+    assert modules == ['gpsfun.export', 'gpsfun.export', 'export']
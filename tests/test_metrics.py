@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""Metrics hook tests"""
+
+import logging
+import pytest
+from pathlib import Path
+from gpsfun import metrics
+from gpsfun.readers import read
+from gpsfun.tracks import Track
+from gpsfun.rallystyle import RallyResults
+
+
+@pytest.fixture
+def dan_b():
+    return Path(__file__).parent.joinpath('test_data/rallystyle/roubaix/dan_b.gpx')
+
+
+def test_collect_stages(dan_b):
+    with metrics.collect() as events:
+        df = read(dan_b)
+        Track(df).calculate
+    assert not metrics.enabled()
+    stages = {e['stage']: e for e in events}
+    assert stages['readers.gpx']['parent'] == 'readers.read'
+    assert stages['readers.read']['points'] == len(df) == 2504
+    assert stages['readers.read']['bytes'] == dan_b.stat().st_size
+    assert stages['track.distance_between']['parent'] == 'track.distance_stats'
+    assert stages['track.calculate']['parent'] is None
+    assert stages['track.calculate']['seconds'] >= stages['track.distance_stats']['seconds']
+    assert all(e['peak_bytes'] is None and e['error'] is None for e in events)
+
+
+def test_file_object_bytes(dan_b):
+    with metrics.collect() as events, open(dan_b, 'rb') as f:
+        read(f)
+    assert events[-1]['bytes'] == dan_b.stat().st_size
+
+
+def test_disabled_and_errors(dan_b):
+    df = read(dan_b)
+    # Nothing is measured without hooks
+    assert metrics.stage('anything') is metrics.stage('else')
+    with metrics.collect() as events:
+        with pytest.raises(Exception) as e:
+            RallyResults(df.iloc[:100], [{'location': {'lat': 40.117348, 'lon': -105.258836}}]).match_checkpoints()
+    assert events[-1]['stage'] == 'rally.match_checkpoints'
+    assert events[-1]['error'] == e.type.__name__
+
+
+def test_trace_memory(dan_b):
+    metrics.trace_memory(True)
+    try:
+        with metrics.collect() as events:
+            read(dan_b)
+    finally:
+        metrics.trace_memory(False)
+    stages = {e['stage']: e for e in events}
+    assert stages['readers.gpx']['peak_bytes'] > 0
+    assert stages['readers.read']['peak_bytes'] >= stages['readers.gpx']['peak_bytes']
+
+
+def test_adapters(dan_b, caplog):
+    counters = metrics.Counters()
+    logging_hook = metrics.LoggingHook()
+
+    def broken(event):
+        raise ValueError()
+
+    for hook in (broken, counters, logging_hook):
+        metrics.add_hook(hook)
+    try:
+        with caplog.at_level(logging.INFO, logger='gpsfun.metrics'):
+            read(dan_b)
+            read(dan_b)
+    finally:
+        for hook in (broken, counters, logging_hook):
+            metrics.remove_hook(hook)
+    assert not metrics.enabled()
+    assert any(r.message.startswith('readers.gpx ') and 'points=2504' in r.message for r in caplog.records)
+    text = counters.expose()
+    assert '# TYPE gpsfun_stage_calls_total counter' in text
+    assert 'gpsfun_stage_calls_total{stage="readers.read"} 2' in text
+    assert 'gpsfun_points_total{stage="readers.gpx"} 5008' in text
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+"""Moving time tests"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+from gpsfun import moving
+from gpsfun.readers import gpx
+from gpsfun.tracks import Track
+
+
+def test_speed_with_long_intervals():
+    # Smart recording, a point every 10 seconds walking the bike at 0.3 m/s
+    seconds = np.array([np.nan, 10, 10, 10, 10])
+    meters = np.array([np.nan, 3, 3, 60, 60])
+    assert moving.moving(seconds, meters, 'simple').tolist() == [True] * 5
+    assert moving.moving(seconds, meters, 'speed', min_speed=0.5).tolist() == [True, False, False, True, True]
+
+
+def test_pause():
+    # 10 seconds stopped at a light, then 40 seconds stopped
+    seconds = np.r_[np.nan, np.ones(60)]
+    meters = np.r_[np.nan, np.full(5, 5.0), np.zeros(10), np.full(5, 5.0), np.zeros(40)]
+    result = moving.moving(seconds, meters, 'pause', min_pause=30)
+    assert result[6:16].all()
+    assert not result[21:].any()
+
+
+def test_auto_pause():
+    seconds = np.r_[np.nan, np.ones(6)]
+    speeds = [np.nan, 5, 1.0, 0.5, 1.0, 1.2, 1.5]
+    result = moving.moving(seconds, np.array(speeds), 'auto_pause', pause_speed=0.9, resume_speed=1.4)
+    assert result.tolist() == [True, True, True, False, False, False, True]
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        moving.moving([1], [1], 'teleport')
+
+
+def test_track_moving_methods():
+    t = Track(gpx(Path(__file__).parent.joinpath('test_data/rallystyle/roubaix/dan_b.gpx')))
+    simple = t.time()['moving_time']
+    # There is a 17 minute stop, simple counts it because the device moved a little
+    paused = t._calc_moving_time('pause', min_pause=30)
+    assert simple - paused > np.timedelta64(17, 'm')
+    assert t.time()['moving_time'] == paused
@@ -3,8 +3,9 @@
 """Rally Style Tests"""
 
 import pytest
+from pathlib import Path
 from datetime import timedelta
-from gpsfun.readers import gpsbabel
+from gpsfun.readers import gpsbabel, gpx
 from gpsfun.tracks import Track
 from gpsfun.rallystyle import RallyResults
 
@@ -46,6 +47,19 @@ def test_roubaix_1(roubaix):
     assert rs.results[-1]['duration'] == None
 
 
+def test_roubaix_native_reader(roubaix):
+    rfile = Path(__file__).parent.joinpath("test_data/rallystyle/roubaix/dan_b.gpx")
+    df = gpx(rfile)
+    columns = df.columns.tolist()
+    rs = RallyResults(df=df, segments=roubaix)
+    assert rs.match_checkpoints() == [128, 1325, 1337, 2434]
+    rs.calc_results()
+    assert df.columns.tolist() == columns
+    assert rs.results[0]['duration'] == timedelta(hours=1, minutes=2, seconds=2)
+    assert rs.results[1]['duration'] == timedelta(hours=0, minutes=0, seconds=33)
+    assert rs.results[-1]['total_timed'].total_seconds() == timedelta(days=0, minutes=50, seconds=9).total_seconds()
+
+
 def test_roubaix_2(roubaix):
     rfile = "test_data/rallystyle/roubaix/dean_d.fit"
     rs = RallyResults(df=Track(gpsbabel(str(rfile))).df, segments=roubaix)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+"""Resampling tests"""
+
+import pytest
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from gpsfun.readers import gpx, tcx
+from gpsfun.gpsfun import resample, increase_points
+from gpsfun.segments import select_near_points
+
+
+@pytest.fixture
+def ride():
+    return gpx(Path(__file__).parent.joinpath('test_data/rallystyle/roubaix/dan_b.gpx'))
+
+
+def test_resample_time(ride):
+    r = resample(ride, 5)
+    assert list(r.columns) == list(ride.columns)
+    assert (r.Date_Time.diff().dropna() == pd.Timedelta(seconds=5)).all()
+    assert r.Date_Time.iloc[0] == ride.Date_Time.iloc[0]
+    assert r.dtypes.equals(ride.dtypes)
+    # At the original times the values are the original values
+    same = r.set_index('Date_Time').join(ride.set_index('Date_Time'), rsuffix='_o', how='inner')
+    assert len(same) > 100
+    assert np.allclose(same.Latitude, same.Latitude_o)
+    assert np.allclose(same.HeartRate, same.HeartRate_o)
+
+
+def test_resample_distance():
+    df = tcx(Path(__file__).parent.joinpath('test_data/tcx/test_tcx_2_laps.tcx'))
+    r = resample(df, 10, by='distance')
+    assert np.allclose(np.diff(r.Distance), 10)
+    assert r.Date_Time.is_monotonic_increasing
+    assert r.Latitude.notna().all()
+    assert set(r.lap.unique()) == {0, 1}
+
+
+def test_increase_points(ride):
+    r = increase_points(ride, '250ms', slice=(100, 200))
+    assert list(r.columns) == ['Date_Time', 'Latitude', 'Longitude', 'Altitude']
+    assert ride.Date_Time.iloc[100:200].isin(r.Date_Time).all()
+    assert r.Date_Time.is_monotonic_increasing
+    assert len(r) > 4 * (ride.Date_Time.iloc[199] - ride.Date_Time.iloc[100]).total_seconds()
+
+
+def test_select_near_points(ride):
+    near = select_near_points({'lat': 40.117348, 'lon': -105.258836}, ride)
+    # Two laps
+    assert near.Date_Time.diff().max() > pd.Timedelta(minutes=30)
+    assert len(near) > 20
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""Track simplification tests"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+from gpsfun import geodesic
+from gpsfun.readers import gpx
+from gpsfun.tracks import Track
+from gpsfun.simplify import simplify, rdp, visvalingam
+
+
+@pytest.fixture
+def ride():
+    return gpx(Path(__file__).parent.joinpath('test_data/gpx/Mt_Evans_Hill_Climb_v1.gpx'))
+
+
+def max_error(df, kept):
+    """Largest distance in meters from a point to the simplified track, checked at the points"""
+    lat, lon = df.Latitude.values, df.Longitude.values
+    k = np.flatnonzero(kept)
+    worst = 0
+    for a, b in zip(k[:-1], k[1:]):
+        i = np.arange(a, b + 1)
+        # The nearest point of a densified segment
+        seg_lat = lat[a] + np.linspace(0, 1, 200)[:, None] * (lat[b] - lat[a])
+        seg_lon = lon[a] + np.linspace(0, 1, 200)[:, None] * (lon[b] - lon[a])
+        d = geodesic.haversine(seg_lat, seg_lon, lat[i], lon[i]).min(axis=0)
+        worst = max(worst, d.max())
+    return worst
+
+
+@pytest.mark.parametrize('method', ['rdp', 'visvalingam'])
+def test_simplify(ride, method):
+    small = simplify(ride, 10, method=method)
+    assert len(small) < len(ride) / 5
+    assert small.index[0] == ride.index[0] and small.index[-1] == ride.index[-1]
+    assert small.index.is_monotonic_increasing
+
+
+def test_rdp_tolerance(ride):
+    part = ride.iloc[:1500]
+    kept = rdp(part.Latitude.values, part.Longitude.values, 10)
+    assert max_error(part, kept) < 10.5
+    assert rdp(part.Latitude.values, part.Longitude.values, 1).sum() > kept.sum()
+
+
+def test_visvalingam_straight_line():
+    lat = np.linspace(40, 40.01, 100)
+    lon = np.full(100, -105.0)
+    assert visvalingam(lat, lon, 1).tolist() == [True] + [False] * 98 + [True]
+    lon[50] += 0.001  # an 85 meter spike
+    assert visvalingam(lat, lon, 1)[50]
+
+
+def test_export_simplified(ride):
+    t = Track(ride)
+    full = t.export_lat_lon_alt()
+    small = t.export_lat_lon_alt(simplify=10)
+    assert len(full) == len(ride)
+    assert set(small[0]) == {'latitude', 'longitude', 'altitude'}
+    assert len(small) < len(full) / 5
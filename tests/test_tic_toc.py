@@ -3,10 +3,15 @@
 """Rally Style Tests"""
 
 import pytest
+import numpy as np
+import pandas as pd
+from pathlib import Path
 from datetime import timedelta
-from gpsfun.readers import gpsbabel
+from gpsfun.readers import gpsbabel, read
 from gpsfun.tracks import Track
 from gpsfun.tic_toc import TicTocResults
+from gpsfun.segments import tictoc_distances
+from gpsfun.exceptions import CalcResultsException
 
 @pytest.fixture
 def watopia_waistband():
@@ -28,5 +33,33 @@ def test_tictok_1(watopia_waistband):
     activity.distance()
     rs = TicTocResults(df=activity.df, segments=watopia_waistband)
     rs.calc_results()
-    assert rs.results[1]['distance'] == 2358.3245572657142
+    # 2358.3245572657142 was one gap short, the end falls between points 2.98 m apart. The gpsbabel distances differ
+    # from the native reader's by the rounding of the coordinates, so it is compared to 0.1 m.
+    assert rs.results[1]['distance'] == pytest.approx(2358.3245572657142 + 2.9824844660251983, abs=0.1)
+
+
+def test_tictoc_native_reader(watopia_waistband):
+    df = read(Path(__file__).parent.joinpath("test_data/tictoc/2020-10-29-19-10-19.fit"))
+    columns = df.columns.tolist()
+    rs = TicTocResults(df=df, segments=watopia_waistband)
+    rs.calc_results()
+    assert df.columns.tolist() == columns
+    assert rs.checkpoints == [18, 2138]
+    assert rs.results[1]['distance'] == 2361.2106412150133
+    assert rs.results[1]['duration'] == timedelta(minutes=5)
+    assert rs.results[1]['datetime'] == df['Date_Time'].iloc[2138]
+    assert rs.results[1]['total_distance'] == rs.results[1]['distance']
+    assert 'distance' not in watopia_waistband[1]
+
+
+def test_tictoc_distances():
+    times = pd.date_range('2020-01-01', periods=11, freq='10s', tz='UTC')
+    distance = np.arange(11) * 100.0
+    # Three sections, ends between points, on a point and before the start of another section
+    distances, ends = tictoc_distances(times.values, distance, [0, 2, 5], pd.to_timedelta(['15s', '30s', '25s']))
+    assert distances == pytest.approx([150, 300, 250])
+    assert ends[0] == (times[0] + pd.Timedelta('15s')).value
+    with pytest.raises(CalcResultsException, match='stops before the end'):
+        tictoc_distances(times.values, distance, [5], pd.to_timedelta(['60s']))
+
 